@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'GameRPSSL.settings')
 
 application = get_asgi_application()
+
+# Django imports the URLconf, and every view with it, on the first request. Loading it with the app means no request
+# waits for it, and workers forked from a preloaded app share it
+get_resolver().urlconf_module
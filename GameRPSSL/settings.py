@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 import environ
@@ -41,20 +42,22 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "gameapi.apps.GameapiConfig",
+    "rest_framework",
     "drf_spectacular",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "gameapi.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    # Before CommonMiddleware, so its redirects get the CORS headers as well
+    "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "corsheaders.middleware.CorsMiddleware",
-    "django.middleware.common.CommonMiddleware",
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 ROOT_URLCONF = "GameRPSSL.urls"
@@ -89,21 +92,145 @@ DATABASES = {
         "PASSWORD": env("DB_PASS"),
         "HOST": env("DB_HOST"),
         "PORT": env("DB_PORT"),
+        # Connections are checked before they are used, a connection the database closed is replaced
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# How the app is served. "wsgi" runs sync gunicorn workers, "asgi" runs uvicorn workers and switches the play,
+# scoreboard and multiplayer endpoints to async views, so a worker isn't held by requests waiting for the database
+SERVING_MODE = env("SERVING_MODE", default="wsgi")
+
+# Every worker process keeps a pool of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections, a request waits up to
+# DB_POOL_TIMEOUT seconds for a free one. Connections above the minimum are closed after being idle for
+# DB_POOL_MAX_IDLE seconds, and every connection is replaced after DB_POOL_MAX_LIFETIME seconds. Without the pool,
+# a worker keeps its connection open for DB_CONN_MAX_AGE seconds
+DB_POOL = env.bool("DB_POOL", default=True)
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=8),
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+            "max_idle": env.float("DB_POOL_MAX_IDLE", default=600.0),
+            "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=3600.0),
+        }
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # The format is picked from the Accept and Content-Type headers, JSON is used when a client doesn't ask for one
+    "DEFAULT_RENDERER_CLASSES": [
+        "gameapi.api.renderers.ORJSONRenderer",
+        "gameapi.api.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "gameapi.api.renderers.ORJSONParser",
+        "gameapi.api.renderers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# "full" runs the whole Django stack. "lean" serves only what the stateless API uses: sessions, messages, auth, CSRF
+# and clickjacking protection are left out, requests aren't authenticated and responses are JSON or MessagePack only
+API_PROFILE = env("API_PROFILE", default="full")
+if API_PROFILE == "lean":
+    INSTALLED_APPS = [
+        "django.contrib.staticfiles",
+        "gameapi.apps.GameapiConfig",
+        "drf_spectacular",
+        "corsheaders",
+    ]
+    MIDDLEWARE = [
+        "gameapi.middleware.MetricsMiddleware",
+        "django.middleware.security.SecurityMiddleware",
+        "corsheaders.middleware.CorsMiddleware",
+        "django.middleware.common.CommonMiddleware",
+    ]
+    TEMPLATES[0]["OPTIONS"]["context_processors"] = [
+        "django.template.context_processors.debug",
+        "django.template.context_processors.request",
+    ]
+    REST_FRAMEWORK |= {
+        "DEFAULT_RENDERER_CLASSES": [
+            "gameapi.api.renderers.ORJSONRenderer",
+            "gameapi.api.renderers.MessagePackRenderer",
+        ],
+        "DEFAULT_AUTHENTICATION_CLASSES": [],
+        "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+        "UNAUTHENTICATED_USER": None,
+    }
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Game RPSSL API",
     "DESCRIPTION": "These are all endpoints that could be used for playing this game",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
+    # Every endpoint can be used without logging in, so the schema doesn't depend on the authentication classes of
+    # the serving mode or the API profile
+    "AUTHENTICATION_WHITELIST": [],
     # OTHER SETTINGS
 }
 
+# Where workers share the scoreboard version stamp. "file" maps SCOREBOARD_VERSION_FILE into memory, which only reaches
+# the workers of one host that see the same file, so deployments with more than one host or container have to use
+# "database", which keeps the stamp in a row and costs a query per scoreboard read
+SCOREBOARD_VERSION_STORE = env("SCOREBOARD_VERSION_STORE", default="file")
+SCOREBOARD_VERSION_FILE = env(
+    "SCOREBOARD_VERSION_FILE",
+    default=str(Path(tempfile.gettempdir()) / "gamerpssl-scoreboard.version"),
+)
+
+# How requests waiting for a multiplayer outcome are woken up, "local" works within a single process and "postgres"
+# uses LISTEN/NOTIFY to reach every worker. gunicorn.conf.py defaults it to "postgres" and refuses "local" with more
+# than one worker
+GAME_NOTIFIER = env("GAME_NOTIFIER", default="local")
+
+# Write-behind mode for single player outcomes. Outcomes are acknowledged before they are stored and written in
+# batches of up to OUTCOME_WRITE_BEHIND_BATCH_SIZE rows every OUTCOME_WRITE_BEHIND_INTERVAL_MS milliseconds. When
+# OUTCOME_WRITE_BEHIND_CAPACITY outcomes are waiting, a request waits up to OUTCOME_WRITE_BEHIND_PUT_TIMEOUT_MS for
+# space and then writes its outcome itself. A batch that can't be written is retried up to OUTCOME_WRITE_BEHIND_RETRIES
+# times with a doubling wait and then dropped with an error log
+OUTCOME_WRITE_BEHIND = env.bool("OUTCOME_WRITE_BEHIND", default=False)
+OUTCOME_WRITE_BEHIND_CAPACITY = env.int("OUTCOME_WRITE_BEHIND_CAPACITY", default=1000)
+OUTCOME_WRITE_BEHIND_BATCH_SIZE = env.int(
+    "OUTCOME_WRITE_BEHIND_BATCH_SIZE", default=100
+)
+OUTCOME_WRITE_BEHIND_INTERVAL_MS = env.int(
+    "OUTCOME_WRITE_BEHIND_INTERVAL_MS", default=50
+)
+OUTCOME_WRITE_BEHIND_PUT_TIMEOUT_MS = env.int(
+    "OUTCOME_WRITE_BEHIND_PUT_TIMEOUT_MS", default=100
+)
+OUTCOME_WRITE_BEHIND_RETRIES = env.int("OUTCOME_WRITE_BEHIND_RETRIES", default=10)
+
+# Single player outcomes older than this many days are pruned by the prune_outcomes command, in batches of
+# OUTCOME_RETENTION_BATCH_SIZE rows
+OUTCOME_RETENTION_DAYS = env.int("OUTCOME_RETENTION_DAYS", default=30)
+OUTCOME_RETENTION_BATCH_SIZE = env.int("OUTCOME_RETENTION_BATCH_SIZE", default=5000)
+
+# Number of rows every statistics counter is split into
+STATS_COUNTER_SHARDS = env.int("STATS_COUNTER_SHARDS", default=8)
+
+# Every rollup run recomputes the hourly buckets of the last ROLLUP_LATENESS_HOURS hours before the previous run, so
+# outcomes that are stored up to that much later than they were created are still counted
+ROLLUP_LATENESS_HOURS = env.int("ROLLUP_LATENESS_HOURS", default=2)
+
+# Directory where every worker process keeps its request metrics, all workers of one deployment have to share it.
+# Starting workers move the values of stopped workers into an archive file and remove their files
+METRICS_DIR = env(
+    "METRICS_DIR", default=str(Path(tempfile.gettempdir()) / "gamerpssl-metrics")
+)
+# GET metrics answers only requests with "Authorization: Bearer <METRICS_TOKEN>", and 404 while it's empty
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# The OpenAPI schema served at schema/, generated by `manage.py build_schema`
+OPENAPI_SCHEMA_FILE = BASE_DIR / "gameapi" / "api" / "openapi.json"
+
 CSP_DEFAULT_SRC = ("'self'", "'unsafe-inline'", "cdn.jsdelivr.net")
 CSP_IMG_SRC = ("'self'", "data:", "cdn.jsdelivr.net")
 
@@ -0,0 +1,38 @@
+import json
+from functools import cache
+
+from django.conf import settings
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.views import SpectacularAPIView
+
+from gameapi.api.v1.responses import StaticPayload
+
+
+def generate_schema() -> dict:
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def dump_schema(schema: dict) -> str:
+    return json.dumps(schema, indent=2, ensure_ascii=False) + "\n"
+
+
+@cache
+def schema_payload() -> StaticPayload:
+    # Read on the first request, every format is rendered once per process
+    schema = json.loads(settings.OPENAPI_SCHEMA_FILE.read_text())
+    return StaticPayload(
+        schema,
+        cache_control="no-cache",
+        renderer_classes=SpectacularAPIView.renderer_classes,
+    )
+
+
+class PrecomputedSchemaView(SpectacularAPIView):
+    """Serves the schema built by `manage.py build_schema` instead of generating it on every request."""
+
+    def _get_schema_response(self, request):
+        response = schema_payload().response(request)
+        response["Content-Disposition"] = (
+            f'inline; filename="{self._get_filename(request, None)}"'
+        )
+        return response
@@ -1,18 +1,52 @@
+import asyncio
+import importlib.util
 import json
+import os
 import uuid
 
 import mock
+import msgpack
 import pytest
+import yaml
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
+from drf_spectacular.generators import SchemaGenerator
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework.views import APIView
 
-from gameapi.constants import id_to_choice, Result, GameChoices
+from gameapi.api.schema import generate_schema
+from gameapi.api.v1.async_views import (
+    AsyncCreateGameView,
+    AsyncPlayGameView,
+    AsyncPlayView,
+    AsyncScoreboardView,
+)
+from gameapi.api.v1.urls import get_urlpatterns
+
+from gameapi.constants import (
+    id_to_choice,
+    Result,
+    GameChoices,
+    MAX_BATCH_PLAYS,
+    CHOICES_MAX_AGE,
+)
 from gameapi.factories import OutcomeFactory, MultiplayerGameFactory
-from gameapi.models import MultiplayerGame
+from gameapi.models import MultiplayerGame, Outcome
+from gameapi.notifier import notifier
+from gameapi.rollups import rollup_outcomes
+from gameapi.scoreboard import scoreboard
+from gameapi.writebehind import OutcomeWriteBehind
 
 
 class APITest(APITestCase):
+    def setUp(self):
+        # Outcomes of other tests are rolled back without touching the scoreboard cache
+        scoreboard.invalidate()
+
     @pytest.mark.django_db
     def test_choices(self):
         url = reverse("choices")
@@ -32,6 +66,47 @@ class APITest(APITestCase):
         choice = response.data
         self.assertEqual(choice["name"], id_to_choice[choice["id"]].value)
 
+    @pytest.mark.django_db
+    def test_choices_cache(self):
+        url = reverse("choices")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            [{"id": _id, "name": choice.value} for _id, choice in id_to_choice.items()],
+        )
+        self.assertEqual(
+            response["Cache-Control"], f"public, max-age={CHOICES_MAX_AGE}"
+        )
+        self.assertIn("Accept", response["Vary"])
+        self.assertNotIn("Cookie", response["Vary"])
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"outdated"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # requested formatting is still rendered per request and has no ETag
+        response = self.client.get(url, HTTP_ACCEPT="application/json; indent=4")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=GameChoices.SPOCK,
+        ):
+            response = self.client.get(reverse("choice"))
+            self.assertEqual(response["Cache-Control"], "no-cache")
+            response = self.client.get(
+                reverse("choice"), HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
     @pytest.mark.django_db
     def test_play(self):
         url = reverse("play")
@@ -58,6 +133,106 @@ class APITest(APITestCase):
             self.assertEqual(response_json["player"], player)
             self.assertEqual(response_json["computer"], computer)
 
+    def test_play_batch(self):
+        url = reverse("play_batch")
+        test_cases = [
+            (2, 1, Result.WIN.value),
+            (2, 2, Result.TIE.value),
+            (1, 2, Result.LOSE.value),
+        ]
+        data = [{"player": player} for player, _, _ in test_cases]
+
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            side_effect=[id_to_choice[computer] for _, computer, _ in test_cases],
+        ):
+            # savepoint, the bulk insert, one counter update per distinct round and the savepoint release
+            with self.assertNumQueries(6):
+                response = self.client.post(
+                    path=url,
+                    data=json.dumps(data, default=str),
+                    content_type="application/json",
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_json = response.json()
+
+        # results are returned in the same order as submitted choices
+        self.assertEqual(len(response_json), len(test_cases))
+        for outcome, (player, computer, result) in zip(response_json, test_cases):
+            self.assertEqual(outcome["results"], result)
+            self.assertEqual(outcome["player"], player)
+            self.assertEqual(outcome["computer"], computer)
+        self.assertEqual(Outcome.objects.count(), len(test_cases))
+
+    def test_play_msgpack(self):
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=id_to_choice[1],
+        ):
+            response = self.client.post(
+                path=reverse("play"),
+                data=msgpack.packb({"player": 2}),
+                content_type="application/msgpack",
+                HTTP_ACCEPT="application/msgpack",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            {"results": Result.WIN.value, "player": 2, "computer": 1},
+        )
+
+        response = self.client.post(
+            path=reverse("play"),
+            data=b"\xc1",
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            reverse("choices"), HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            [{"id": _id, "name": choice.value} for _id, choice in id_to_choice.items()],
+        )
+        self.assertNotEqual(
+            response["ETag"], self.client.get(reverse("choices"))["ETag"]
+        )
+
+    def test_cors(self):
+        response = self.client.get(reverse("choices"), HTTP_ORIGIN="http://game.test")
+        self.assertEqual(response["Access-Control-Allow-Origin"], "*")
+
+        # responses of CommonMiddleware, like the redirect that appends a slash, get the headers too
+        response = self.client.get("/schema", HTTP_ORIGIN="http://game.test")
+        self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "*")
+
+    def test_browsable_api(self):
+        response = self.client.get(reverse("choices"), HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+        self.assertContains(response, GameChoices.SPOCK.value)
+
+    def test_play_batch_invalid(self):
+        url = reverse("play_batch")
+        invalid_payloads = [
+            [],
+            {"player": 1},
+            [{"player": 1}, {"player": 6}],
+            [{"player": 1}] * (MAX_BATCH_PLAYS + 1),
+        ]
+
+        for data in invalid_payloads:
+            response = self.client.post(
+                path=url,
+                data=json.dumps(data, default=str),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Outcome.objects.count(), 0)
+
     def test_scoreboard(self):
         url = reverse("scoreboard")
 
@@ -75,7 +250,8 @@ class APITest(APITestCase):
         self.assertEqual(len(response_json), 10)
 
         # Delete the scoreboard
-        self.client.delete(path=url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(path=url)
 
         # Check that 0 outcomes are returned
         response = self.client.get(
@@ -85,6 +261,105 @@ class APITest(APITestCase):
 
         self.assertEqual(len(response_json), 0)
 
+        # Outcomes played after the reset are shown again
+        outcome = OutcomeFactory(game=None)
+        outcome.save()
+        scoreboard.invalidate()
+        response_json = self.client.get(path=url).json()
+        self.assertEqual(
+            response_json,
+            [
+                {
+                    "results": outcome.result,
+                    "player": outcome.player_1_choice,
+                    "computer": outcome.player_2_choice,
+                }
+            ],
+        )
+
+    def test_scoreboard_cache(self):
+        url = reverse("scoreboard")
+        for _ in range(10):
+            OutcomeFactory(game=None).save()
+
+        # first read loads the scoreboard, the following one is served from memory
+        response = self.client.get(path=url)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(path=url)
+        self.assertEqual(response.json(), cached_response.json())
+
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=GameChoices.ROCK,
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    path=reverse("play"),
+                    data=json.dumps({"player": 2}, default=str),
+                    content_type="application/json",
+                )
+
+        with self.assertNumQueries(0):
+            response_json = self.client.get(path=url).json()
+        self.assertEqual(len(response_json), 10)
+        self.assertEqual(
+            response_json[0],
+            {"results": Result.WIN.value, "player": 2, "computer": 1},
+        )
+        self.assertEqual(response_json[1:], cached_response.json()[:9])
+
+    @override_settings(OUTCOME_WRITE_BEHIND=True)
+    def test_play_write_behind(self):
+        write_behind = OutcomeWriteBehind(
+            capacity=10, batch_size=10, interval=1, put_timeout=0, autostart=False
+        )
+        url = reverse("scoreboard")
+        # loading the scoreboard before playing
+        self.client.get(path=url)
+
+        with (
+            mock.patch("gameapi.api.v1.views.outcome_write_behind", write_behind),
+            mock.patch(
+                "gameapi.api.v1.views.get_random_choice",
+                return_value=GameChoices.ROCK,
+            ),
+        ):
+            response = self.client.post(
+                path=reverse("play"),
+                data=json.dumps({"player": 2}, default=str),
+                content_type="application/json",
+            )
+            expected = {"results": Result.WIN.value, "player": 2, "computer": 1}
+            self.assertEqual(response.json(), expected)
+            self.assertFalse(Outcome.objects.exists())
+
+            # acknowledged plays are on the scoreboard before they are written
+            self.assertEqual(self.client.get(path=url).json(), [expected])
+            scoreboard.invalidate()
+            self.assertEqual(self.client.get(path=url).json(), [expected])
+
+            acknowledged_at = write_behind.pending()[0].created_at
+            write_behind.flush()
+            self.assertEqual(Outcome.objects.count(), 1)
+            self.assertEqual(self.client.get(path=url).json(), [expected])
+            # the outcome keeps the time it was acknowledged at, not the time it was written at
+            self.assertEqual(Outcome.objects.get().created_at, acknowledged_at)
+
+            # outcomes acknowledged before a reset stay off the scoreboard, before and after they are written
+            self.client.post(
+                path=reverse("play"),
+                data=json.dumps({"player": 2}, default=str),
+                content_type="application/json",
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(path=url)
+            self.assertEqual(self.client.get(path=url).json(), [])
+            scoreboard.invalidate()
+            self.assertEqual(self.client.get(path=url).json(), [])
+            write_behind.flush()
+            scoreboard.invalidate()
+            self.assertEqual(self.client.get(path=url).json(), [])
+
     def test_create_game(self):
         url = reverse("create_game")
 
@@ -155,12 +430,13 @@ class APITest(APITestCase):
         )
         game.save()
 
-        # First valid request for player 1
-        response = self.client.post(
-            path=url_player_1,
-            data=request_data,
-            content_type="application/json",
-        )
+        # First valid request for player 1, the move is stored with a single conditional update
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                path=url_player_1,
+                data=request_data,
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
         # Second valid request for player 2, but repeated - testing 405
@@ -171,13 +447,18 @@ class APITest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
-        # Valid play for player 2
-        response = self.client.post(
-            path=url_player_2,
-            data=request_data,
-            content_type="application/json",
-        )
+        # Valid play for player 2, the move, the round reset with the outcome and its statistics counter. Postgres
+        # resets the round and inserts the outcome in one statement
+        with self.assertNumQueries(3 if connection.vendor == "postgresql" else 4):
+            response = self.client.post(
+                path=url_player_2,
+                data=request_data,
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        game.refresh_from_db()
+        self.assertIsNone(game.player_1_choice)
+        self.assertIsNone(game.player_2_choice)
 
         # Test if both responses match for the same game
         response_1 = self.client.get(path=url_player_1).json()
@@ -185,3 +466,625 @@ class APITest(APITestCase):
 
         self.assertEqual(response_1, response_2)
         self.assertEqual(len(response_1["outcomes"]), 1)
+
+    def test_next_outcome(self):
+        game = MultiplayerGameFactory(
+            player_1_uuid=uuid.uuid4(), player_2_uuid=uuid.uuid4()
+        )
+        game.save()
+        url = reverse("next_outcome", kwargs={"player_uuid": game.player_2_uuid})
+
+        response = self.client.get(
+            reverse("next_outcome", kwargs={"player_uuid": uuid.uuid4()})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {"after": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Nothing was played, the request times out
+        response = self.client.get(url, {"timeout": 0})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # Completing a round wakes up waiting requests of this game
+        request_data = json.dumps({"player": 1}, default=str)
+        with mock.patch.object(notifier, "publish") as publish:
+            for player_uuid in [game.player_1_uuid, game.player_2_uuid]:
+                self.client.post(
+                    path=reverse(
+                        "multiplayer_game", kwargs={"player_uuid": player_uuid}
+                    ),
+                    data=request_data,
+                    content_type="application/json",
+                )
+        publish.assert_called_once_with(game.id)
+
+        outcome = game.outcomes.get()
+        response = self.client.get(url, {"after": 0, "timeout": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "cursor": outcome.id,
+                "outcome": {
+                    "results": Result.TIE.value,
+                    "player_1": 1,
+                    "player_2": 1,
+                },
+            },
+        )
+
+        # Only outcomes newer than the cursor are returned
+        response = self.client.get(url, {"after": outcome.id, "timeout": 0})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        # An outcome stored while the request waits is returned even when no notification reaches the request
+        async def store_outcome(future, timeout):
+            await Outcome.objects.acreate(
+                game=game, result=Result.WIN.value, player_1_choice=1, player_2_choice=3
+            )
+            raise TimeoutError
+
+        with (
+            override_settings(SERVING_MODE="asgi"),
+            mock.patch("gameapi.api.v1.views.asyncio.wait_for", store_outcome),
+        ):
+            response = self.client.get(url, {"after": outcome.id, "timeout": 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["outcome"]["results"], Result.WIN.value)
+
+        # Served through WSGI, the request doesn't wait and doesn't hold the worker
+        cursor = response.json()["cursor"]
+        with mock.patch("gameapi.api.v1.views.asyncio.wait_for") as wait_for:
+            response = self.client.get(url, {"after": cursor, "timeout": 60})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        wait_for.assert_not_called()
+        response = self.client.get(url, {"after": outcome.id, "timeout": 60})
+        self.assertEqual(response.json()["cursor"], cursor)
+
+    def test_multiplayer_game_conditional_get(self):
+        player_1_uuid = self.client.post(reverse("create_game")).json()["player_uuid"]
+        url = reverse("multiplayer_game", kwargs={"player_uuid": player_1_uuid})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # the other player joining changes the version
+        player_2_uuid = self.client.post(reverse("create_game")).json()["player_uuid"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+
+        # an unchanged game is answered by the version check alone
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        etags = {etag}
+        for player_uuid in [player_1_uuid, player_2_uuid]:
+            self.client.post(
+                path=reverse("multiplayer_game", kwargs={"player_uuid": player_uuid}),
+                data=json.dumps({"player": 1}, default=str),
+                content_type="application/json",
+            )
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn(response["ETag"], etags)
+            etags.add(response["ETag"])
+        self.assertEqual(len(response.json()["outcomes"]), 1)
+
+        # a rejected move doesn't change the game
+        self.client.post(
+            path=reverse("multiplayer_game", kwargs={"player_uuid": player_1_uuid}),
+            data=json.dumps({"player": 1}, default=str),
+            content_type="application/json",
+        )
+        etag = self.client.get(url)["ETag"]
+        self.client.post(
+            path=reverse("multiplayer_game", kwargs={"player_uuid": player_1_uuid}),
+            data=json.dumps({"player": 2}, default=str),
+            content_type="application/json",
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+    def test_multiplayer_game_history(self):
+        game = MultiplayerGameFactory(
+            player_1_uuid=uuid.uuid4(), player_2_uuid=uuid.uuid4()
+        )
+        game.save()
+        outcomes = [OutcomeFactory(game=game) for _ in range(5)]
+        for outcome in outcomes:
+            outcome.save()
+        url = reverse("multiplayer_game", kwargs={"player_uuid": game.player_1_uuid})
+
+        def outcome_data(outcome):
+            return {
+                "results": outcome.result,
+                "player_1": outcome.player_1_choice,
+                "player_2": outcome.player_2_choice,
+            }
+
+        # paginating through the whole history, the number of queries doesn't depend on the page size
+        with self.assertNumQueries(2):
+            response_json = self.client.get(url, {"limit": 2}).json()
+        self.assertEqual(
+            response_json["outcomes"], [outcome_data(o) for o in outcomes[:2]]
+        )
+        self.assertEqual(response_json["next_cursor"], outcomes[1].id)
+
+        response_json = self.client.get(
+            url, {"limit": 2, "cursor": response_json["next_cursor"]}
+        ).json()
+        self.assertEqual(
+            response_json["outcomes"], [outcome_data(o) for o in outcomes[2:4]]
+        )
+
+        response_json = self.client.get(
+            url, {"limit": 2, "cursor": response_json["next_cursor"]}
+        ).json()
+        self.assertEqual(response_json["outcomes"], [outcome_data(outcomes[4])])
+        self.assertIsNone(response_json["next_cursor"])
+
+        # following the game returns only newer rounds and keeps the cursor
+        response_json = self.client.get(url, {"since": outcomes[3].id}).json()
+        self.assertEqual(response_json["outcomes"], [outcome_data(outcomes[4])])
+        self.assertEqual(response_json["next_cursor"], outcomes[4].id)
+
+        response_json = self.client.get(url, {"since": outcomes[4].id}).json()
+        self.assertEqual(response_json["outcomes"], [])
+        self.assertEqual(response_json["next_cursor"], outcomes[4].id)
+
+        for params in [{"limit": 0}, {"cursor": -1}, {"cursor": 1, "since": 1}]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats(self):
+        url = reverse("stats")
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=GameChoices.ROCK,
+        ):
+            self.client.post(
+                path=reverse("play"),
+                data=json.dumps({"player": 2}, default=str),
+                content_type="application/json",
+            )
+            self.client.post(
+                path=reverse("play_batch"),
+                data=json.dumps([{"player": 1}, {"player": 3}], default=str),
+                content_type="application/json",
+            )
+        game = MultiplayerGameFactory(
+            player_1_uuid=uuid.uuid4(), player_2_uuid=uuid.uuid4()
+        )
+        game.save()
+        for player_uuid, choice in [(game.player_1_uuid, 5), (game.player_2_uuid, 4)]:
+            self.client.post(
+                path=reverse("multiplayer_game", kwargs={"player_uuid": player_uuid}),
+                data=json.dumps({"player": choice}, default=str),
+                content_type="application/json",
+            )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.json()
+
+        def choice_counts(counts):
+            return [
+                {
+                    "id": choice_id,
+                    "name": choice.value,
+                    "count": counts.get(choice_id, 0),
+                }
+                for choice_id, choice in id_to_choice.items()
+            ]
+
+        self.assertEqual(
+            stats["single_player"],
+            {
+                "total": 3,
+                "results": {"win": 1, "lose": 1, "tie": 1},
+                "player_choices": choice_counts({1: 1, 2: 1, 3: 1}),
+                "opponent_choices": choice_counts({1: 3}),
+            },
+        )
+        self.assertEqual(
+            stats["multiplayer"],
+            {
+                "total": 1,
+                "results": {"win": 1, "lose": 0, "tie": 0},
+                "player_choices": choice_counts({5: 1}),
+                "opponent_choices": choice_counts({4: 1}),
+            },
+        )
+
+    @pytest.mark.django_db
+    def test_stats_timeseries(self):
+        url = reverse("stats_timeseries")
+        game = MultiplayerGameFactory()
+        game.save()
+        outcomes = [
+            OutcomeFactory(
+                game=None, player_1_choice=1, player_2_choice=3, result="lose"
+            ),
+            OutcomeFactory(
+                game=None, player_1_choice=2, player_2_choice=2, result="tie"
+            ),
+            OutcomeFactory(
+                game=game, player_1_choice=5, player_2_choice=4, result="win"
+            ),
+        ]
+        for outcome in outcomes:
+            outcome.save()
+
+        # outcomes are only included once they are rolled up
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+
+        rollup_outcomes()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"interval": "day"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        buckets = response.json()
+        self.assertEqual(len(buckets), 1)
+        self.assertTrue(buckets[0]["bucket"].endswith("T00:00:00Z"))
+        self.assertEqual(buckets[0]["single_player"]["total"], 2)
+        self.assertEqual(
+            buckets[0]["single_player"]["results"], {"win": 0, "lose": 1, "tie": 1}
+        )
+        self.assertEqual(buckets[0]["multiplayer"]["total"], 1)
+        self.assertEqual(
+            buckets[0]["multiplayer"]["player_choices"][4],
+            {"id": 5, "name": id_to_choice[5].value, "count": 1},
+        )
+
+        for params in [
+            {"interval": "minute"},
+            {"start": "2024-01-02T00:00:00Z", "end": "2024-01-01T00:00:00Z"},
+            {"start": "2020-01-01T00:00:00Z", "end": "2024-01-01T00:00:00Z"},
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics(self):
+        with override_settings(METRICS_TOKEN=""):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for headers in [{}, {"HTTP_AUTHORIZATION": "Bearer wrong"}]:
+            response = self.client.get(reverse("metrics"), **headers)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response["WWW-Authenticate"], "Bearer")
+
+        def exported_values():
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response["Content-Type"].startswith("text/plain"))
+            return dict(
+                line.rsplit(" ", 1)
+                for line in response.content.decode().splitlines()
+                if not line.startswith("#")
+            )
+
+        before = exported_values()
+        self.client.post(
+            path=reverse("play"),
+            data=json.dumps({"player": 1}, default=str),
+            content_type="application/json",
+        )
+        after = exported_values()
+
+        def increase(name):
+            return float(after[name]) - float(before.get(name, 0))
+
+        self.assertEqual(
+            increase('gameapi_http_responses_total{route="play",status="2xx"}'), 1
+        )
+        self.assertEqual(
+            increase('gameapi_http_request_duration_seconds_count{route="play"}'), 1
+        )
+        self.assertGreater(increase('gameapi_db_queries_total{route="play"}'), 0)
+        self.assertGreater(increase('gameapi_render_seconds_total{route="play"}'), 0)
+        self.assertGreater(
+            increase('gameapi_serialization_seconds_total{route="play"}'), 0
+        )
+
+
+class AsyncURLConf:
+    urlpatterns = get_urlpatterns("asgi")
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncAPITest(APITransactionTestCase):
+    # Async views run their transactions in threads with connections of their own, so the data is committed
+    def setUp(self):
+        scoreboard.invalidate()
+
+    def post_json(self, url, data):
+        return self.client.post(
+            path=url, data=json.dumps(data), content_type="application/json"
+        )
+
+    def test_views_are_async(self):
+        for view in [
+            AsyncPlayView,
+            AsyncScoreboardView,
+            AsyncCreateGameView,
+            AsyncPlayGameView,
+        ]:
+            self.assertTrue(view.view_is_async)
+
+    def test_play_and_scoreboard(self):
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=GameChoices.ROCK,
+        ):
+            response = self.post_json(reverse("play"), {"player": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), {"results": Result.WIN.value, "player": 2, "computer": 1}
+        )
+        self.assertEqual(Outcome.objects.count(), 1)
+
+        response = self.post_json(reverse("play"), {"player": 9})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("play"))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        response = self.client.get(reverse("scoreboard"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), [{"results": Result.WIN.value, "player": 2, "computer": 1}]
+        )
+
+        # clearing the cache blocks on a file lock, so it doesn't run on the event loop
+        clear = scoreboard.clear
+        on_event_loop = []
+
+        def clear_in_thread():
+            try:
+                on_event_loop.append(asyncio.get_running_loop() is not None)
+            except RuntimeError:
+                on_event_loop.append(False)
+            clear()
+
+        with mock.patch.object(scoreboard, "clear", clear_in_thread):
+            response = self.client.delete(reverse("scoreboard"))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(on_event_loop, [False])
+        self.assertEqual(self.client.get(reverse("scoreboard")).json(), [])
+
+    def test_multiplayer_game(self):
+        unknown_url = reverse("multiplayer_game", kwargs={"player_uuid": uuid.uuid4()})
+        self.assertEqual(
+            self.client.get(unknown_url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.post_json(unknown_url, {"player": 1}).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+        player_uuids = []
+        for _ in range(2):
+            response = self.client.post(reverse("create_game"))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            player_uuids.append(response.json()["player_uuid"])
+        url_player_1, url_player_2 = [
+            reverse("multiplayer_game", kwargs={"player_uuid": player_uuid})
+            for player_uuid in player_uuids
+        ]
+
+        response = self.post_json(url_player_1, {"player": 1})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.post_json(url_player_1, {"player": 1})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        response = self.post_json(url_player_2, {"player": 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url_player_2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["player_1_uuid"], player_uuids[0])
+        self.assertEqual(
+            response.json()["outcomes"],
+            [{"results": Result.WIN.value, "player_1": 1, "player_2": 3}],
+        )
+        response = self.client.get(url_player_1, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_schema_matches_sync_views(self):
+        def operations(serving_mode):
+            schema = SchemaGenerator(patterns=get_urlpatterns(serving_mode)).get_schema(
+                request=None, public=True
+            )
+            # async views don't authenticate
+            return {
+                path: {
+                    method: {
+                        key: value
+                        for key, value in operation.items()
+                        if key != "security"
+                    }
+                    for method, operation in methods.items()
+                }
+                for path, methods in schema["paths"].items()
+            }
+
+        self.assertEqual(operations("asgi"), operations("wsgi"))
+
+
+def load_settings_profile(api_profile):
+    # A fresh copy of the settings module, as it is evaluated with API_PROFILE set
+    spec = importlib.util.find_spec("GameRPSSL.settings")
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, {"API_PROFILE": api_profile}):
+        spec.loader.exec_module(module)
+    return {
+        name: getattr(module, name)
+        for name in ["INSTALLED_APPS", "MIDDLEWARE", "TEMPLATES", "REST_FRAMEWORK"]
+    }
+
+
+FULL_PROFILE = load_settings_profile("full")
+LEAN_PROFILE = load_settings_profile("lean")
+
+
+@override_settings(**LEAN_PROFILE)
+class LeanProfileTest(APITestCase):
+    def setUp(self):
+        scoreboard.invalidate()
+        # Views take the DRF defaults when they are defined, as they would be in a process started with the profile
+        patcher = mock.patch.multiple(
+            APIView,
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES,
+            authentication_classes=api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+            permission_classes=api_settings.DEFAULT_PERMISSION_CLASSES,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_json(self, url, data):
+        return self.client.post(
+            url, data=json.dumps(data), content_type="application/json"
+        )
+
+    def test_middleware(self):
+        for profile in [FULL_PROFILE, LEAN_PROFILE]:
+            self.assertEqual(
+                len(profile["MIDDLEWARE"]), len(set(profile["MIDDLEWARE"]))
+            )
+        for app in [
+            "django.contrib.auth",
+            "django.contrib.sessions",
+            "django.contrib.messages",
+        ]:
+            self.assertNotIn(app, LEAN_PROFILE["INSTALLED_APPS"])
+
+        for profile in [FULL_PROFILE, LEAN_PROFILE]:
+            middleware = profile["MIDDLEWARE"]
+            self.assertLess(
+                middleware.index("corsheaders.middleware.CorsMiddleware"),
+                middleware.index("django.middleware.common.CommonMiddleware"),
+            )
+
+        response = self.client.get(reverse("choices"), HTTP_ORIGIN="http://game.test")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "*")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertNotIn("X-Frame-Options", response)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+        self.assertEqual(
+            self.client.get(
+                reverse("choices"), HTTP_IF_NONE_MATCH=response["ETag"]
+            ).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+    def test_play_and_scoreboard(self):
+        with mock.patch(
+            "gameapi.api.v1.views.get_random_choice",
+            return_value=GameChoices.ROCK,
+        ):
+            response = self.post_json(reverse("play"), {"player": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), {"results": Result.WIN.value, "player": 2, "computer": 1}
+        )
+        response = self.post_json(reverse("play"), {"player": 9})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            reverse("scoreboard"), HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            [{"results": Result.WIN.value, "player": 2, "computer": 1}],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("scoreboard"))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(reverse("scoreboard")).json(), [])
+
+        # the browsable API isn't rendered
+        response = self.client.get(reverse("scoreboard"), HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_multiplayer_game(self):
+        player_uuids = [
+            self.client.post(reverse("create_game")).json()["player_uuid"]
+            for _ in range(2)
+        ]
+        url_player_1, url_player_2 = [
+            reverse("multiplayer_game", kwargs={"player_uuid": player_uuid})
+            for player_uuid in player_uuids
+        ]
+        response = self.post_json(url_player_1, {"player": 1})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.post_json(url_player_2, {"player": 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url_player_1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["outcomes"],
+            [{"results": Result.WIN.value, "player_1": 1, "player_2": 3}],
+        )
+        response = self.client.get(url_player_2, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_openapi_docs(self):
+        # the schema built with the full profile is the schema of the lean profile too
+        response = self.client.get(reverse("schema"), {"format": "json"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), generate_schema())
+
+        for url_name in ["swagger-ui", "redoc"]:
+            response = self.client.get(reverse(url_name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(reverse("schema"), response.content.decode())
+
+
+class SchemaTest(APITestCase):
+    def test_schema_is_served_from_file(self):
+        schema = json.loads(settings.OPENAPI_SCHEMA_FILE.read_text())
+        with mock.patch.object(
+            SchemaGenerator, "get_schema", side_effect=AssertionError
+        ):
+            json_response = self.client.get(reverse("schema"), {"format": "json"})
+            yaml_response = self.client.get(reverse("schema"))
+        self.assertEqual(json_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json_response.json(), schema)
+        self.assertEqual(yaml_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            yaml_response["Content-Type"], "application/vnd.oai.openapi; charset=utf-8"
+        )
+        self.assertEqual(yaml.safe_load(yaml_response.content), schema)
+        self.assertIn("Game RPSSL API.yaml", yaml_response["Content-Disposition"])
+
+        self.assertNotEqual(json_response["ETag"], yaml_response["ETag"])
+        for response, query in [
+            (json_response, {"format": "json"}),
+            (yaml_response, {}),
+        ]:
+            self.assertEqual(response["Cache-Control"], "no-cache")
+            response = self.client.get(
+                reverse("schema"), query, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b"")
+
+    def test_docs(self):
+        for url_name in ["swagger-ui", "redoc"]:
+            response = self.client.get(reverse(url_name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(reverse("schema"), response.content.decode())
@@ -0,0 +1,300 @@
+import json
+import os
+import re
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from gameapi.api.v1.urls import urlpatterns
+from gameapi.models import MultiplayerGame, Outcome, ScoreboardReset
+from gameapi.rollups import rollup_outcomes
+from gameapi.rules import resolve
+from gameapi.scoreboard import scoreboard
+from gameapi.stats import get_counter_keys
+
+# Size of the data the budgets are checked against, 90000 outcomes by default. The budgets don't depend on it, so
+# running with a larger scale, for example QUERY_BUDGET_GAMES=10000 QUERY_BUDGET_OUTCOMES_PER_GAME=100, shows that the
+# lookups are constant-time
+GAMES = int(os.environ.get("QUERY_BUDGET_GAMES", 2000))
+OUTCOMES_PER_GAME = int(os.environ.get("QUERY_BUDGET_OUTCOMES_PER_GAME", 20))
+SINGLE_PLAYER_OUTCOMES = int(
+    os.environ.get("QUERY_BUDGET_SINGLE_PLAYER_OUTCOMES", 50000)
+)
+BATCH_SIZE = 5000
+
+# The statistics read every counter row, one per game mode, choices and shard
+COUNTER_ROWS = len(get_counter_keys()) * settings.STATS_COUNTER_SHARDS
+
+
+class QueryBudget(NamedTuple):
+    queries: int
+    rows: int
+
+
+# Maximum number of queries and of rows the database reads for one request, per URL name and method. The rows are the
+# most measured on Postgres and SQLite plus a small margin
+BUDGETS = {
+    ("choices", "get"): QueryBudget(queries=0, rows=0),
+    ("choice", "get"): QueryBudget(queries=0, rows=0),
+    # statistic counters are updated once per result and choices of the played rounds
+    ("play", "post"): QueryBudget(queries=4, rows=5),
+    ("play_batch", "post"): QueryBudget(queries=8, rows=15),
+    ("scoreboard", "get"): QueryBudget(queries=1, rows=5),
+    ("scoreboard", "delete"): QueryBudget(queries=1, rows=2),
+    ("stats", "get"): QueryBudget(queries=1, rows=COUNTER_ROWS),
+    ("stats_timeseries", "get"): QueryBudget(queries=1, rows=50),
+    ("create_game", "post"): QueryBudget(queries=4, rows=5),
+    ("multiplayer_game", "get"): QueryBudget(queries=2, rows=50),
+    ("multiplayer_game", "post"): QueryBudget(queries=4, rows=10),
+    ("next_outcome", "get"): QueryBudget(queries=2, rows=5),
+    ("metrics", "get"): QueryBudget(queries=0, rows=0),
+}
+
+_EXPLAINED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def _postgres_rows_scanned(sql: str) -> int:
+    # Actual rows read by every scan node, including the ones thrown away by a filter. Statements that change data
+    # are rolled back after they were analyzed
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0][0]["Plan"]
+            transaction.set_rollback(True)
+    except IntegrityError:
+        # An INSERT of a row that was stored already can't run again, the planner's estimate is used instead
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0][0]["Plan"]
+
+    def scanned(node: dict) -> float:
+        rows = 0.0
+        if node["Node Type"] == "Bitmap Index Scan":
+            # the rows it finds are read, and counted, by the Bitmap Heap Scan above it
+            pass
+        elif "Scan" in node["Node Type"] and "Actual Rows" not in node:
+            rows = node["Plan Rows"]
+        elif "Scan" in node["Node Type"]:
+            rows = (
+                node["Actual Rows"]
+                + node.get("Rows Removed by Filter", 0)
+                + node.get("Rows Removed by Index Recheck", 0)
+            ) * node["Actual Loops"]
+        return rows + sum(scanned(child) for child in node.get("Plans", []))
+
+    return int(scanned(plan))
+
+
+def _sqlite_rows_scanned(sql: str) -> int:
+    # SQLite doesn't report rows read, so this is an estimate: every table read without an index counts as a scan of
+    # the whole table, except a scan in primary key order that is cut off by a LIMIT without sorting
+    aliases = dict(
+        (alias, table) for table, alias in re.findall(r'"(\w+)" (U\d+)', sql)
+    )
+    rows = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        plan = [detail for *_, detail in cursor.fetchall()]
+        sorted_in_memory = any("USE TEMP B-TREE" in detail for detail in plan)
+        for detail in plan:
+            match = re.fullmatch(r"SCAN (\w+)", detail)
+            if not match:
+                continue
+            alias = match.group(1)
+            table = aliases.get(alias, alias)
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            table_rows = cursor.fetchone()[0]
+            limit = re.search(
+                rf'ORDER BY "?{alias}"?\."id" (?:ASC|DESC) LIMIT (\d+)', sql
+            )
+            if limit and not sorted_in_memory:
+                table_rows = min(table_rows, int(limit.group(1)))
+            rows += table_rows
+    return rows
+
+
+def rows_scanned(sql: str) -> int:
+    if not sql.lstrip().upper().startswith(_EXPLAINED_STATEMENTS):
+        return 0
+    if connection.vendor == "postgresql":
+        return _postgres_rows_scanned(sql)
+    return _sqlite_rows_scanned(sql)
+
+
+class QueryBudgetTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        games = MultiplayerGame.objects.bulk_create(
+            [MultiplayerGame(waiting_another_player=False) for _ in range(GAMES)],
+            batch_size=BATCH_SIZE,
+        )
+        outcomes = [
+            Outcome(
+                game=game,
+                player_1_choice=i % 5 + 1,
+                player_2_choice=i % 3 + 1,
+                result=resolve(i % 5 + 1, i % 3 + 1).value,
+            )
+            for game in games
+            for i in range(OUTCOMES_PER_GAME)
+        ] + [
+            Outcome(
+                player_1_choice=i % 5 + 1,
+                player_2_choice=i % 4 + 1,
+                result=resolve(i % 5 + 1, i % 4 + 1).value,
+            )
+            for i in range(SINGLE_PLAYER_OUTCOMES)
+        ]
+        Outcome.objects.bulk_create(outcomes, batch_size=BATCH_SIZE)
+        # everything played so far is hidden from the scoreboard
+        ScoreboardReset.objects.create(
+            last_outcome_id=Outcome.objects.order_by("-id").values("id")[0]["id"]
+        )
+        for i in range(3):
+            Outcome.objects.create(
+                player_1_choice=1, player_2_choice=2, result=resolve(1, 2).value
+            )
+        rollup_outcomes()
+        if connection.vendor == "postgresql":
+            # Without statistics of the new rows the planner may read a whole table, depending on when autovacuum ran
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        cls.game = games[GAMES // 2]
+
+    def setUp(self):
+        scoreboard.invalidate()
+
+    def assertWithinBudget(self, url_name, method, request):
+        budget = BUDGETS[(url_name, method)]
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        self.assertLess(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        queries = [query["sql"] for query in context.captured_queries]
+        self.assertLessEqual(
+            len(queries),
+            budget.queries,
+            f"{method.upper()} {url_name} made {len(queries)} queries:\n"
+            + "\n".join(queries),
+        )
+        scanned = [(rows_scanned(sql), sql) for sql in queries]
+        self.assertLessEqual(
+            sum(rows for rows, _ in scanned),
+            budget.rows,
+            f"{method.upper()} {url_name} read too many rows:\n"
+            + "\n".join(f"{rows}: {sql}" for rows, sql in scanned),
+        )
+        return response
+
+    def test_every_endpoint_has_a_budget(self):
+        url_names = {
+            pattern.name for pattern in urlpatterns if isinstance(pattern, URLPattern)
+        }
+        self.assertEqual(url_names, {url_name for url_name, _ in BUDGETS})
+
+    def test_choices(self):
+        self.assertWithinBudget(
+            "choices", "get", lambda: self.client.get(reverse("choices"))
+        )
+        self.assertWithinBudget(
+            "choice", "get", lambda: self.client.get(reverse("choice"))
+        )
+
+    def test_play(self):
+        self.assertWithinBudget(
+            "play",
+            "post",
+            lambda: self.client.post(
+                reverse("play"),
+                data=json.dumps({"player": 1}),
+                content_type="application/json",
+            ),
+        )
+        self.assertWithinBudget(
+            "play_batch",
+            "post",
+            lambda: self.client.post(
+                reverse("play_batch"),
+                data=json.dumps([{"player": choice} for choice in range(1, 6)]),
+                content_type="application/json",
+            ),
+        )
+
+    def test_scoreboard(self):
+        response = self.assertWithinBudget(
+            "scoreboard", "get", lambda: self.client.get(reverse("scoreboard"))
+        )
+        self.assertEqual(len(response.json()), 3)
+        self.assertWithinBudget(
+            "scoreboard", "delete", lambda: self.client.delete(reverse("scoreboard"))
+        )
+
+    def test_stats(self):
+        self.assertWithinBudget(
+            "stats", "get", lambda: self.client.get(reverse("stats"))
+        )
+        self.assertWithinBudget(
+            "stats_timeseries",
+            "get",
+            lambda: self.client.get(reverse("stats_timeseries"), {"interval": "day"}),
+        )
+
+    def test_create_game(self):
+        self.assertWithinBudget(
+            "create_game", "post", lambda: self.client.post(reverse("create_game"))
+        )
+        self.assertWithinBudget(
+            "create_game", "post", lambda: self.client.post(reverse("create_game"))
+        )
+
+    def test_multiplayer_game(self):
+        url = reverse(
+            "multiplayer_game", kwargs={"player_uuid": self.game.player_1_uuid}
+        )
+        response = self.assertWithinBudget(
+            "multiplayer_game", "get", lambda: self.client.get(url, {"limit": 50})
+        )
+        self.assertEqual(len(response.json()["outcomes"]), min(OUTCOMES_PER_GAME, 50))
+        self.assertWithinBudget(
+            "multiplayer_game",
+            "get",
+            lambda: self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]),
+        )
+
+        for player_uuid in [self.game.player_1_uuid, self.game.player_2_uuid]:
+            self.assertWithinBudget(
+                "multiplayer_game",
+                "post",
+                lambda: self.client.post(
+                    reverse("multiplayer_game", kwargs={"player_uuid": player_uuid}),
+                    data=json.dumps({"player": 1}),
+                    content_type="application/json",
+                ),
+            )
+        self.assertWithinBudget(
+            "multiplayer_game",
+            "get",
+            lambda: self.client.get(url, {"since": 0, "limit": 1}),
+        )
+
+    def test_next_outcome(self):
+        url = reverse("next_outcome", kwargs={"player_uuid": self.game.player_2_uuid})
+        self.assertWithinBudget(
+            "next_outcome", "get", lambda: self.client.get(url, {"after": 0})
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics(self):
+        self.assertWithinBudget(
+            "metrics",
+            "get",
+            lambda: self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            ),
+        )
@@ -0,0 +1,155 @@
+from asyncio import iscoroutine
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from gameapi.api.v1.serializers import PlayInputSerializer, PlayerSerializer
+from gameapi.api.v1.views import (
+    CreateGameView,
+    PlayGameView,
+    PlayView,
+    ScoreboardView,
+    check_game_version,
+    game_history_query,
+    game_history_response,
+    load_scoreboard,
+    play_against_computer,
+    play_round,
+    round_response,
+)
+from gameapi.matchmaking import join_game
+from gameapi.metrics import measure_rendering
+from gameapi.models import Outcome, ScoreboardReset
+from gameapi.scoreboard import scoreboard
+from gameapi.utils import afind_game_by_player_uuid, aget_game_history
+
+
+def in_thread(func):
+    # Django's async ORM can't run transactions, so blocking units of work run in a thread of their own. Unlike the
+    # async ORM, they don't wait for queries of other requests. The connection is closed afterwards, which gives it
+    # back to the pool
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        def run():
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        return await sync_to_async(run, thread_sensitive=False)()
+
+    return wrapper
+
+
+def same_schema(sync_handler):
+    # The async handlers are documented by the @extend_schema of the sync handlers they replace
+    def decorator(handler):
+        handler.kwargs = sync_handler.kwargs
+        return handler
+
+    return decorator
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with async handlers, for serving through ASGI.
+
+    Authentication is skipped, the game is played anonymously and looking up a session would need the database.
+    Responses are rendered before they are returned, so rendering doesn't need a thread either.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        with measure_rendering():
+            return self.response.render()
+
+
+class AsyncPlayView(AsyncAPIView):
+    serializer_class = PlayInputSerializer
+
+    @same_schema(PlayView.post)
+    async def post(self, request, *args, **kwargs):
+        serializer = PlayInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = await in_thread(play_against_computer)(
+            serializer.validated_data["player"]
+        )
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+class AsyncScoreboardView(AsyncAPIView):
+    @same_schema(ScoreboardView.get)
+    async def get(self, request, *args, **kwargs):
+        data = await in_thread(scoreboard.get)(load_scoreboard)
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    @same_schema(ScoreboardView.delete)
+    async def delete(self, request, *args, **kwargs):
+        await ScoreboardReset.objects.acreate(
+            last_outcome_id=Coalesce(
+                Subquery(Outcome.objects.order_by("-id").values("id")[:1]), 0
+            )
+        )
+        # there is no transaction around it, the reset is committed already. Clearing bumps the shared version under a
+        # file lock, so it runs in a thread
+        await in_thread(scoreboard.clear)()
+        return Response(data=None, status=status.HTTP_204_NO_CONTENT)
+
+
+class AsyncCreateGameView(AsyncAPIView):
+    @same_schema(CreateGameView.post)
+    async def post(self, request, *args, **kwargs):
+        player_seat = await in_thread(join_game)()
+        serializer = PlayerSerializer(data={"player_uuid": player_seat.player_uuid})
+        serializer.is_valid(raise_exception=True)
+        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncPlayGameView(AsyncAPIView):
+    @same_schema(PlayGameView.get)
+    async def get(self, request, *args, **kwargs):
+        query = game_history_query(request)
+        game = await afind_game_by_player_uuid(kwargs.get("player_uuid"))
+        headers, response = check_game_version(request, game)
+        if response is not None:
+            return response
+        return game_history_response(await aget_game_history(game, **query), headers)
+
+    @same_schema(PlayGameView.post)
+    async def post(self, request, *args, **kwargs):
+        serializer = PlayInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        round_status = await in_thread(play_round)(
+            kwargs.get("player_uuid"), serializer.data["player"]
+        )
+        return round_response(round_status)
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer, TemplateHTMLRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class PrerenderedResponse(Response):
+    # Keeps `data` like any other response, but its body was rendered in advance
+    def __init__(self, data, content: bytes, content_type: str, **kwargs):
+        super().__init__(data=data, content_type=content_type, **kwargs)
+        self._content = content
+
+    @property
+    def rendered_content(self):
+        self["Content-Type"] = self.content_type
+        return self._content
+
+
+class StaticPayload:
+    """
+    Response data that never changes, rendered once for every configured renderer and served with a strong ETag.
+
+    Renderers whose output depends on the request, like the browsable API, render it per request as usual.
+    """
+
+    def __init__(self, data, cache_control: str, renderer_classes=None):
+        self.data = data
+        self._cache_control = cache_control
+        self._rendered: dict[type, tuple[bytes, str, str]] = {}
+        if renderer_classes is None:
+            renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+        for renderer_class in renderer_classes:
+            renderer = renderer_class()
+            if isinstance(renderer, (BrowsableAPIRenderer, TemplateHTMLRenderer)):
+                continue
+            content = renderer.render(data, renderer.media_type, {})
+            if isinstance(content, str):
+                content = content.encode(renderer.charset)
+            content_type = renderer.media_type
+            if renderer.charset is not None:
+                content_type = f"{content_type}; charset={renderer.charset}"
+            etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+            self._rendered[renderer_class] = (content, content_type, etag)
+
+    def response(self, request) -> Response:
+        rendered = self._rendered.get(type(request.accepted_renderer))
+        # Media type parameters, like `indent`, change the rendered content
+        if rendered is None or (
+            request.accepted_media_type != request.accepted_renderer.media_type
+        ):
+            return Response(data=self.data, status=status.HTTP_200_OK)
+
+        content, content_type, etag = rendered
+        headers = {"ETag": etag, "Cache-Control": self._cache_control}
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        else:
+            response = PrerenderedResponse(
+                self.data,
+                content,
+                content_type,
+                status=status.HTTP_200_OK,
+                headers=headers,
+            )
+        patch_vary_headers(response, ["Accept"])
+        return response
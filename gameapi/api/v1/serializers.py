@@ -1,7 +1,20 @@
+from collections.abc import Iterable, Sequence
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
-from gameapi.constants import id_to_choice
-from gameapi.models import Outcome, MultiplayerGame
+from gameapi.constants import (
+    id_to_choice,
+    OUTCOME_WAIT_TIMEOUT,
+    MAX_OUTCOME_WAIT_TIMEOUT,
+    OUTCOME_PAGE_SIZE,
+    MAX_OUTCOME_PAGE_SIZE,
+    TIMESERIES_DEFAULT_DAYS,
+    TIMESERIES_MAX_DAYS,
+)
+from gameapi.models import Outcome
+from gameapi.rollups import TIMESERIES_INTERVALS
 
 
 class ChoiceSerializer(serializers.Serializer):
@@ -35,15 +48,132 @@ class OutcomeSerializer(serializers.ModelSerializer):
         fields = ["results", "player_1", "player_2"]
 
 
-class GameSerializer(serializers.ModelSerializer):
+class GameSerializer(serializers.Serializer):
     player_1_uuid = serializers.UUIDField()
     player_2_uuid = serializers.UUIDField()
     outcomes = OutcomeSerializer(many=True)
+    next_cursor = serializers.IntegerField(allow_null=True)
 
-    class Meta:
-        model = MultiplayerGame
-        fields = ["player_1_uuid", "player_2_uuid", "outcomes"]
+
+class GameHistoryInputSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text="Return the page of outcomes that follows this cursor",
+    )
+    since = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text="Return only outcomes newer than this cursor, next_cursor always points to the newest one",
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_OUTCOME_PAGE_SIZE, default=OUTCOME_PAGE_SIZE
+    )
+
+    def validate(self, attrs):
+        if "cursor" in attrs and "since" in attrs:
+            raise serializers.ValidationError("Use either cursor or since, not both")
+        return attrs
 
 
 class PlayerSerializer(serializers.Serializer):
     player_uuid = serializers.UUIDField()
+
+
+class OutcomeWaitSerializer(serializers.Serializer):
+    after = serializers.IntegerField(min_value=0, required=False)
+    timeout = serializers.FloatField(
+        min_value=0, max_value=MAX_OUTCOME_WAIT_TIMEOUT, default=OUTCOME_WAIT_TIMEOUT
+    )
+
+
+class OutcomeEventSerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(source="id")
+    outcome = OutcomeSerializer(source="*")
+
+
+class ResultCountsSerializer(serializers.Serializer):
+    win = serializers.IntegerField()
+    lose = serializers.IntegerField()
+    tie = serializers.IntegerField()
+
+
+class ChoiceCountSerializer(ChoiceSerializer):
+    count = serializers.IntegerField()
+
+
+class ModeStatsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    results = ResultCountsSerializer()
+    player_choices = ChoiceCountSerializer(many=True)
+    opponent_choices = ChoiceCountSerializer(many=True)
+
+
+class StatsSerializer(serializers.Serializer):
+    single_player = ModeStatsSerializer()
+    multiplayer = ModeStatsSerializer()
+
+
+class TimeseriesInputSerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(
+        choices=list(TIMESERIES_INTERVALS), default="hour"
+    )
+    start = serializers.DateTimeField(
+        required=False,
+        help_text=f"Defaults to {TIMESERIES_DEFAULT_DAYS} day(s) before end",
+    )
+    end = serializers.DateTimeField(
+        required=False, help_text="Defaults to the current time"
+    )
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault(
+            "start", attrs["end"] - timedelta(days=TIMESERIES_DEFAULT_DAYS)
+        )
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError("start has to be before end")
+        if attrs["end"] - attrs["start"] > timedelta(days=TIMESERIES_MAX_DAYS):
+            raise serializers.ValidationError(
+                f"The time range can't be longer than {TIMESERIES_MAX_DAYS} days"
+            )
+        return attrs
+
+
+class TimeseriesBucketSerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField()
+    single_player = ModeStatsSerializer()
+    multiplayer = ModeStatsSerializer()
+
+
+class CompiledSerializer:
+    """
+    Produces the output of a serializer from `values_list` rows instead of model instances.
+
+    The serializer fields are resolved once, a row holds the value of every field source in the order of `sources`.
+    Nested `many=True` serializers take a list of rows of their own. The declared serializer stays the API schema.
+    """
+
+    def __init__(self, serializer_class: type[serializers.Serializer]):
+        self._fields = []
+        for name, field in serializer_class().fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                to_representation = CompiledSerializer(type(field.child)).many
+            else:
+                to_representation = field.to_representation
+            self._fields.append((name, field.source, to_representation))
+        self.sources = tuple(source for _, source, _ in self._fields)
+
+    def to_representation(self, row: Sequence) -> dict:
+        return {
+            name: None if value is None else to_representation(value)
+            for (name, _, to_representation), value in zip(self._fields, row)
+        }
+
+    def many(self, rows: Iterable[Sequence]) -> list[dict]:
+        return [self.to_representation(row) for row in rows]
+
+    def from_object(self, instance) -> dict:
+        return self.to_representation(
+            [getattr(instance, source) for source in self.sources]
+        )
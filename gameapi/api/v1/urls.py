@@ -1,23 +1,56 @@
+from django.conf import settings
 from django.urls import path
 
+from gameapi.api.v1.async_views import (
+    AsyncCreateGameView,
+    AsyncPlayGameView,
+    AsyncPlayView,
+    AsyncScoreboardView,
+)
 from gameapi.api.v1.views import (
     ChoicesView,
     PlayView,
+    PlayBatchView,
     ChoiceView,
     ScoreboardView,
     PlayGameView,
     CreateGameView,
+    NextOutcomeView,
+    StatsView,
+    TimeseriesView,
+    MetricsView,
 )
 
-urlpatterns = [
-    path("choices", ChoicesView.as_view(), name="choices"),
-    path("choice", ChoiceView.as_view(), name="choice"),
-    path("play", PlayView.as_view(), name="play"),
-    path("scoreboard", ScoreboardView.as_view(), name="scoreboard"),
-    path("multiplayer_game", CreateGameView.as_view(), name="create_game"),
-    path(
-        "multiplayer_game/<uuid:player_uuid>",
-        PlayGameView.as_view(),
-        name="multiplayer_game",
-    ),
-]
+
+def get_urlpatterns(serving_mode: str) -> list:
+    # With ASGI, the endpoints that use the database the most are served by async views
+    if serving_mode == "asgi":
+        play_view, scoreboard_view = AsyncPlayView, AsyncScoreboardView
+        create_game_view, play_game_view = AsyncCreateGameView, AsyncPlayGameView
+    else:
+        play_view, scoreboard_view = PlayView, ScoreboardView
+        create_game_view, play_game_view = CreateGameView, PlayGameView
+    return [
+        path("choices", ChoicesView.as_view(), name="choices"),
+        path("choice", ChoiceView.as_view(), name="choice"),
+        path("play", play_view.as_view(), name="play"),
+        path("play/batch", PlayBatchView.as_view(), name="play_batch"),
+        path("scoreboard", scoreboard_view.as_view(), name="scoreboard"),
+        path("stats", StatsView.as_view(), name="stats"),
+        path("stats/timeseries", TimeseriesView.as_view(), name="stats_timeseries"),
+        path("multiplayer_game", create_game_view.as_view(), name="create_game"),
+        path(
+            "multiplayer_game/<uuid:player_uuid>",
+            play_game_view.as_view(),
+            name="multiplayer_game",
+        ),
+        path(
+            "multiplayer_game/<uuid:player_uuid>/next_outcome",
+            NextOutcomeView.as_view(),
+            name="next_outcome",
+        ),
+        path("metrics", MetricsView.as_view(), name="metrics"),
+    ]
+
+
+urlpatterns = get_urlpatterns(settings.SERVING_MODE)
@@ -1,48 +1,237 @@
+import asyncio
+import secrets
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import parse_etags
+from django.views import View
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from gameapi.api.v1.responses import StaticPayload
 from gameapi.api.v1.serializers import (
+    CompiledSerializer,
+    OutcomeSerializer,
     ChoiceSerializer,
     PlayInputSerializer,
     PlayOutputSerializer,
     PlayerSerializer,
     GameSerializer,
+    OutcomeWaitSerializer,
+    OutcomeEventSerializer,
+    GameHistoryInputSerializer,
+    StatsSerializer,
+    TimeseriesInputSerializer,
+    TimeseriesBucketSerializer,
+)
+from gameapi.constants import (
+    choice_to_id,
+    CHOICES_MAX_AGE,
+    MAX_BATCH_PLAYS,
+    SCOREBOARD_SIZE,
+)
+from gameapi.matchmaking import join_game
+from gameapi.metrics import measure_serialization, metrics
+from gameapi.models import (
+    Choice,
+    GameHistory,
+    MultiplayerGame,
+    Outcome,
+    ScoreboardReset,
 )
-from gameapi.constants import choice_to_id, id_to_choice
-from gameapi.models import Choice, Outcome, MultiplayerGame
+from gameapi.notifier import notifier
+from gameapi.rollups import get_timeseries
+from gameapi.rounds import RoundStatus, submit_move
+from gameapi.rules import resolve, resolve_many
+from gameapi.scoreboard import scoreboard
+from gameapi.stats import get_stats, record_outcomes
 from gameapi.utils import (
     get_random_choice,
-    did_player_1_win,
     find_game_by_player_uuid,
-    get_result_from_bool,
+    find_player_seat,
+    get_game_history,
+)
+from gameapi.writebehind import outcome_write_behind
+
+# Scoreboard and game history serialize many outcomes per request, they are built from rows instead of instances
+PLAY_OUTPUT = CompiledSerializer(PlayOutputSerializer)
+GAME = CompiledSerializer(GameSerializer)
+OUTCOME = CompiledSerializer(OutcomeSerializer)
+
+
+def record_on_scoreboard(outcomes: list[Outcome], data: list[dict]) -> None:
+    entries = [(outcome.id, dict(item)) for outcome, item in zip(outcomes, data)]
+    transaction.on_commit(lambda: scoreboard.record(entries))
+
+
+def load_scoreboard() -> list[tuple[int | None, dict]]:
+    # Acknowledged outcomes that are still buffered are taken before the database is read. One written in between
+    # is found in both and only counted once
+    pending = outcome_write_behind.pending()
+    last_reset = ScoreboardReset.objects.order_by("-id").values("last_outcome_id")[:1]
+    outcomes = Outcome.objects.filter(id__gt=Coalesce(Subquery(last_reset), 0))
+    if settings.OUTCOME_WRITE_BEHIND or pending:
+        # Outcomes written behind get their ids when they are flushed, which can be after a reset. Those acknowledged
+        # before the reset are told apart by the time they were created at
+        reset_at = (
+            ScoreboardReset.objects.order_by("-id")
+            .values_list("created_at", flat=True)
+            .first()
+        )
+        if reset_at is not None:
+            outcomes = outcomes.filter(created_at__gt=reset_at)
+            pending = [outcome for outcome in pending if outcome.created_at > reset_at]
+    # Ordered by id, so the newest outcomes after the reset are read straight from the primary key, however many
+    # older outcomes are still stored
+    rows = outcomes.order_by("-id").values_list(
+        "id", "created_at", *PLAY_OUTPUT.sources
+    )[:SCOREBOARD_SIZE]
+    with measure_serialization():
+        entries = [
+            (outcome_id, created_at, PLAY_OUTPUT.to_representation(values))
+            for outcome_id, created_at, *values in rows
+        ]
+    if pending:
+        stored_ids = {outcome_id for outcome_id, _, _ in entries}
+        entries = sorted(
+            entries
+            + [
+                (outcome.id, outcome.created_at, PLAY_OUTPUT.from_object(outcome))
+                for outcome in pending
+                if outcome.id not in stored_ids
+            ],
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:SCOREBOARD_SIZE]
+    return [(outcome_id, data) for outcome_id, _, data in entries]
+
+
+def play_against_computer(player_choice_id: int) -> dict:
+    random_choice_id = choice_to_id[get_random_choice()]
+    game_outcome = resolve(player_choice_id, random_choice_id)
+    outcome = Outcome(
+        result=game_outcome.value,
+        player_1_choice=player_choice_id,
+        player_2_choice=random_choice_id,
+    )
+    if settings.OUTCOME_WRITE_BEHIND:
+        outcome_write_behind.submit(outcome)
+        with measure_serialization():
+            data = PlayOutputSerializer(outcome).data
+        scoreboard.push([(None, dict(data))])
+        return data
+
+    with transaction.atomic():
+        outcome.save()
+        record_outcomes([outcome])
+    with measure_serialization():
+        data = PlayOutputSerializer(outcome).data
+    record_on_scoreboard([outcome], [data])
+    return data
+
+
+def play_round(player_uuid: uuid.UUID, choice_id: int) -> RoundStatus:
+    submission = submit_move(player_uuid, choice_id)
+    if submission.status == RoundStatus.COMPLETED:
+        outcome = submission.outcome
+        record_on_scoreboard([outcome], [PlayOutputSerializer(outcome).data])
+        notifier.publish(outcome.game_id)
+    return submission.status
+
+
+def round_response(round_status: RoundStatus) -> Response:
+    if round_status == RoundStatus.NOT_FOUND:
+        return Response(
+            status=status.HTTP_404_NOT_FOUND, data={"error": "Game not found"}
+        )
+    if round_status == RoundStatus.ALREADY_PLAYED:
+        # Answers can't be updated, only the one who was the last to answer creates an Outcome
+        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED, data=None)
+    if round_status == RoundStatus.WAITING:
+        # This is the first answer in this round, we need to wait for the other player
+        return Response(status=status.HTTP_202_ACCEPTED, data=None)
+    return Response(status=status.HTTP_201_CREATED, data=None)
+
+
+def game_history_query(request) -> dict:
+    # Arguments of `get_game_history` for the query parameters of a game history request
+    input_serializer = GameHistoryInputSerializer(data=request.query_params)
+    input_serializer.is_valid(raise_exception=True)
+    params = input_serializer.validated_data
+    return {
+        "after": params.get("since", params.get("cursor", 0)),
+        "limit": params["limit"],
+        "follow": "since" in params,
+        "values": OUTCOME.sources,
+    }
+
+
+def check_game_version(
+    request, game: MultiplayerGame | None
+) -> tuple[dict, Response | None]:
+    # Returns the headers of the game history, and the response when the outcomes don't have to be read
+    if not game:
+        return {}, Response(
+            status=status.HTTP_404_NOT_FOUND, data={"error": "Game not found"}
+        )
+    # The game is read before its outcomes, an outcome added in between can only make the ETag older than the
+    # response, never newer
+    headers = {"ETag": f'"v{game.version}"', "Cache-Control": "no-cache"}
+    if headers["ETag"] in parse_etags(request.headers.get("If-None-Match", "")):
+        return headers, Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return headers, None
+
+
+def game_history_response(history: GameHistory, headers: dict) -> Response:
+    with measure_serialization():
+        data = GAME.from_object(history)
+    return Response(status=status.HTTP_200_OK, data=data, headers=headers)
+
+
+CHOICES_PAYLOAD = StaticPayload(
+    ChoiceSerializer(Choice.get_all_choices(), many=True).data,
+    cache_control=f"public, max-age={CHOICES_MAX_AGE}",
 )
+# The choice is random, so clients have to check with the server every time
+CHOICE_PAYLOADS = {
+    choice: StaticPayload(
+        ChoiceSerializer(Choice.from_game_choice(choice)).data,
+        cache_control="no-cache",
+    )
+    for choice in choice_to_id
+}
 
 
 class ChoicesView(APIView):
+    # Choices are the same for everyone, skipping authentication keeps the session out of the response
+    authentication_classes = []
+    permission_classes = []
 
     @extend_schema(
         description="This endpoint will return a list of all valid choices",
         responses={status.HTTP_200_OK: ChoiceSerializer(many=True)},
     )
     def get(self, request, *args, **kwargs):
-        data = Choice.get_all_choices()
-        serializer = ChoiceSerializer(data, many=True)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return CHOICES_PAYLOAD.response(request)
 
 
 class ChoiceView(APIView):
+    authentication_classes = []
+    permission_classes = []
 
     @extend_schema(
         description="This endpoint will return a randomly selected valid choice",
         responses={status.HTTP_200_OK: ChoiceSerializer(many=True)},
     )
     def get(self, request, *args, **kwargs):
-        choice = get_random_choice()
-        serializer = ChoiceSerializer(Choice.from_game_choice(choice))
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return CHOICE_PAYLOADS[get_random_choice()].response(request)
 
 
 class PlayView(APIView):
@@ -60,20 +249,52 @@ class PlayView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = PlayInputSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        player_choice_id = serializer.validated_data["player"]
-        player_choice = id_to_choice[player_choice_id]
-
-        random_choice = get_random_choice()
-        result = did_player_1_win(player_choice, random_choice)
-        game_outcome = get_result_from_bool(result)
-        outcome = Outcome(
-            result=game_outcome.value,
-            player_1_choice=player_choice_id,
-            player_2_choice=choice_to_id[random_choice],
+        data = play_against_computer(serializer.validated_data["player"])
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+class PlayBatchView(APIView):
+    serializer_class = PlayInputSerializer
+
+    @extend_schema(
+        request=PlayInputSerializer(many=True),
+        description="This endpoint will play multiple rounds with computer in one request. Every round is resolved "
+        "the same way as in the play endpoint, and outcomes are returned in the same order as the submitted choices",
+        responses={
+            status.HTTP_200_OK: PlayOutputSerializer(many=True),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                description="Bad request.",
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = PlayInputSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=MAX_BATCH_PLAYS
         )
-        outcome.save()
-        serializer = PlayOutputSerializer(outcome)
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        serializer.is_valid(raise_exception=True)
+
+        player_choice_ids = [play["player"] for play in serializer.validated_data]
+        random_choice_ids = [
+            choice_to_id[get_random_choice()] for _ in player_choice_ids
+        ]
+        game_outcomes = resolve_many(player_choice_ids, random_choice_ids)
+        outcomes = [
+            Outcome(
+                result=game_outcome.value,
+                player_1_choice=player_choice_id,
+                player_2_choice=random_choice_id,
+            )
+            for player_choice_id, random_choice_id, game_outcome in zip(
+                player_choice_ids, random_choice_ids, game_outcomes
+            )
+        ]
+        with transaction.atomic():
+            Outcome.objects.bulk_create(outcomes)
+            record_outcomes(outcomes)
+        with measure_serialization():
+            data = PlayOutputSerializer(outcomes, many=True).data
+        record_on_scoreboard(outcomes, data)
+        return Response(data=data, status=status.HTTP_200_OK)
 
 
 class ScoreboardView(APIView):
@@ -82,12 +303,11 @@ class ScoreboardView(APIView):
         responses={200: PlayOutputSerializer(many=False)},
     )
     def get(self, request, *args, **kwargs):
-        last_10_outcomes = Outcome.objects.all().order_by("-created_at")[:10]
-        data = PlayOutputSerializer(last_10_outcomes, many=True).data
+        data = scoreboard.get(load_scoreboard)
         return Response(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
-        description="This endpoint will restart the scoreboard by deleting all outcomes",
+        description="This endpoint will restart the scoreboard, outcomes played before the restart aren't shown anymore",
         responses={
             status.HTTP_204_NO_CONTENT: OpenApiResponse(
                 response=None, description="Data is deleted"
@@ -95,12 +315,49 @@ class ScoreboardView(APIView):
         },
     )
     def delete(self, request, *args, **kwargs):
-        # TODO: Possible improvement would be to create a cron job that would periodically delete Outcomes
-        #  that aren't used for scoreboard (last 10 Outcomes)
-        Outcome.objects.all().delete()
+        # Outcomes aren't deleted here, the scoreboard only shows outcomes newer than the last reset. Single player
+        # outcomes hidden by a reset are deleted later by the prune_outcomes command
+        ScoreboardReset.objects.create(
+            last_outcome_id=Coalesce(
+                Subquery(Outcome.objects.order_by("-id").values("id")[:1]), 0
+            )
+        )
+        transaction.on_commit(scoreboard.clear)
         return Response(data=None, status=status.HTTP_204_NO_CONTENT)
 
 
+class StatsView(APIView):
+    @extend_schema(
+        description="This endpoint will return the number of played games by result and by chosen choices, separately "
+        "for games against the computer and multiplayer games. In multiplayer games the player is player 1 and the "
+        "opponent is player 2",
+        responses={status.HTTP_200_OK: StatsSerializer},
+    )
+    def get(self, request, *args, **kwargs):
+        stats = get_stats()
+        with measure_serialization():
+            data = StatsSerializer(stats).data
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+class TimeseriesView(APIView):
+    @extend_schema(
+        description="This endpoint will return the same statistics as the stats endpoint for every hour or day "
+        "with played games between start and end. The statistics are updated by the periodic rollup of outcomes, "
+        "games played since the last rollup aren't included yet",
+        parameters=[TimeseriesInputSerializer],
+        responses={status.HTTP_200_OK: TimeseriesBucketSerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs):
+        input_serializer = TimeseriesInputSerializer(data=request.query_params)
+        input_serializer.is_valid(raise_exception=True)
+        params = input_serializer.validated_data
+        timeseries = get_timeseries(params["interval"], params["start"], params["end"])
+        with measure_serialization():
+            data = TimeseriesBucketSerializer(timeseries, many=True).data
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
 class CreateGameView(APIView):
     @extend_schema(
         description="This endpoint will pair two players for the same game. First request will create a game with two "
@@ -116,15 +373,8 @@ class CreateGameView(APIView):
         # TODO: Possible improvement for the multiplayer game is to add an idempotency key for game creation
         #  (repeated request with the same idempotency key will return the same player_uuid). Or changing to only
         #  allowing signed in users to play
-        with transaction.atomic():
-            game, created = MultiplayerGame.objects.select_for_update().get_or_create(
-                waiting_another_player=True
-            )
-            if not created:
-                game.waiting_another_player = False
-                game.save(update_fields=["waiting_another_player"])
-        player_uuid = game.player_1_uuid if created else game.player_2_uuid
-        serializer = PlayerSerializer(data={"player_uuid": player_uuid})
+        player_seat = join_game()
+        serializer = PlayerSerializer(data={"player_uuid": player_seat.player_uuid})
         serializer.is_valid(raise_exception=True)
 
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
@@ -132,9 +382,13 @@ class CreateGameView(APIView):
 
 class PlayGameView(APIView):
     @extend_schema(
-        description="This endpoint will return all outcomes for a valid player_uuid. The correct user could be checked "
+        description="This endpoint will return outcomes for a valid player_uuid. The correct user could be checked "
         "in the response (both player's uuids are accounted for). The result of an outcome is taken from "
-        "the perspective of the player 1",
+        "the perspective of the player 1. Outcomes are returned in pages ordered from the oldest one, use "
+        "next_cursor as the cursor parameter to get the following page, or as the since parameter to get only "
+        "rounds played after it. The response has the game version as its ETag, a request with a matching If-None-Match "
+        "header gets 304 without the outcomes",
+        parameters=[GameHistoryInputSerializer],
         responses={
             status.HTTP_200_OK: OpenApiResponse(response=GameSerializer),
             status.HTTP_404_NOT_FOUND: OpenApiResponse(
@@ -145,14 +399,12 @@ class PlayGameView(APIView):
     def get(self, request, *args, **kwargs):
         # TODO: Possible improvement would be to change the outcome result to the perspective of the player who
         #  requested the results
-        player_uuid = kwargs.get("player_uuid")
-        game = find_game_by_player_uuid(player_uuid)
-        if not game:
-            return Response(
-                status=status.HTTP_404_NOT_FOUND, data={"error": "Game not found"}
-            )
-        serializer = GameSerializer(game)
-        return Response(status=status.HTTP_200_OK, data=serializer.data)
+        query = game_history_query(request)
+        game = find_game_by_player_uuid(kwargs.get("player_uuid"))
+        headers, response = check_game_version(request, game)
+        if response is not None:
+            return response
+        return game_history_response(get_game_history(game, **query), headers)
 
     @extend_schema(
         request=PlayInputSerializer,
@@ -183,60 +435,76 @@ class PlayGameView(APIView):
         choice_id = serializer.data["player"]
         player_uuid = kwargs.get("player_uuid")
 
-        with transaction.atomic():
-            game = find_game_by_player_uuid(player_uuid)
-            if not game:
-                return Response(
-                    status=status.HTTP_404_NOT_FOUND, data={"error": "Game not found"}
-                )
-            player_1_played = game.player_1_uuid == player_uuid
-            player_1_choice_id = game.player_1_choice
-            player_2_choice_id = game.player_2_choice
-
-            if player_1_played:
-                # We know that the player 1 has played, the question is does the player already have an answer or not
-                if player_1_choice_id:
-                    # if he has an answer we need to block the update of it. Answers can't be updated
-                    # Also only the one who was the last to answer should create an Outcome
-                    return Response(
-                        status=status.HTTP_405_METHOD_NOT_ALLOWED, data=None
-                    )
-                if not player_2_choice_id:
-                    # This is the first answer from player 1, and also player 2 hasn't played,
-                    # we need to wait for player 2
-                    game.player_1_choice = choice_id
-                    game.save(update_fields=["player_1_choice"])
-                    return Response(status=status.HTTP_202_ACCEPTED, data=None)
-                # Both players played
-                player_1_choice_id = choice_id
-
-            else:
-                # Same logic as for player 1
-                if player_2_choice_id:
-                    # player has already played
-                    return Response(
-                        status=status.HTTP_405_METHOD_NOT_ALLOWED, data=None
-                    )
-                if not player_1_choice_id:
-                    # This is the first answer from player 2, and also player 1 hasn't played,
-                    # we need to wait for player 2
-                    game.player_2_choice = choice_id
-                    game.save(update_fields=["player_2_choice"])
-                    return Response(status=status.HTTP_202_ACCEPTED, data=None)
-                # Both players played
-                player_2_choice_id = choice_id
-
-            result = did_player_1_win(
-                id_to_choice[player_1_choice_id], id_to_choice[player_2_choice_id]
-            )
-            game_outcome = get_result_from_bool(result)
-            Outcome.objects.create(
-                game=game,
-                player_1_choice=player_1_choice_id,
-                player_2_choice=player_2_choice_id,
-                result=game_outcome.value,
+        return round_response(play_round(player_uuid, choice_id))
+
+
+class NextOutcomeView(View):
+    # Plain async Django view, so a waiting request doesn't hold a worker when served through ASGI
+
+    async def get(self, request, *args, **kwargs):
+        serializer = OutcomeWaitSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        player_seat = await sync_to_async(find_player_seat)(kwargs.get("player_uuid"))
+        if not player_seat:
+            return JsonResponse(
+                {"error": "Game not found"}, status=status.HTTP_404_NOT_FOUND
             )
-            game.player_1_choice = None
-            game.player_2_choice = None
-            game.save(update_fields=["player_1_choice", "player_2_choice"])
-        return Response(status=status.HTTP_201_CREATED, data=None)
+        game_id = player_seat.game.id
+        after = serializer.validated_data.get("after")
+        loop = asyncio.get_running_loop()
+        timeout = serializer.validated_data["timeout"]
+        if settings.SERVING_MODE != "asgi":
+            # A sync worker would be held for the whole wait, and gunicorn kills workers that are busy for longer than
+            # its timeout, so under WSGI the request is answered at once
+            timeout = 0
+        deadline = loop.time() + timeout
+
+        while True:
+            # Subscribing before looking at the database makes sure an outcome created in between isn't missed
+            future = notifier.subscribe(game_id)
+            try:
+                if after is None:
+                    # Without a cursor the request waits for the round that is currently played
+                    after = (
+                        await Outcome.objects.filter(game_id=game_id)
+                        .order_by("-id")
+                        .values_list("id", flat=True)
+                        .afirst()
+                    ) or 0
+                outcome = (
+                    await Outcome.objects.filter(game_id=game_id, id__gt=after)
+                    .order_by("id")
+                    .afirst()
+                )
+                if outcome is not None:
+                    return JsonResponse(OutcomeEventSerializer(outcome).data)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except TimeoutError:
+                    # The database is checked once more, an outcome committed without a notification reaching this
+                    # process is still returned
+                    pass
+            finally:
+                notifier.unsubscribe(game_id, future)
+
+
+class MetricsView(View):
+    # Plain Django view, the Prometheus text format doesn't go through content negotiation
+
+    def get(self, request, *args, **kwargs):
+        # Disabled unless a token is configured, scrapers send it as a bearer token
+        if not settings.METRICS_TOKEN:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        if not secrets.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+        ):
+            response = HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        return HttpResponse(
+            metrics.export(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class GameapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gameapi'
+
+    def ready(self):
+        from gameapi.metrics import install_query_timer
+
+        connection_created.connect(install_query_timer)
@@ -0,0 +1,123 @@
+import re
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import Any, NamedTuple
+from urllib.parse import urlencode
+
+import requests
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+_METRIC_LINE = re.compile(r'^(\w+)\{route="(\w+)"(?:,status="\w+")?\} (\S+)$')
+
+
+class Sample(NamedTuple):
+    route: str
+    status: int
+    latency: float
+    queries: int | None
+
+
+class BenchmarkClient(ABC):
+    """Sends requests to the API by URL name and keeps a sample of every response."""
+
+    def __init__(self):
+        self.samples: list[Sample] = []
+
+    def request(
+        self,
+        method: str,
+        route: str,
+        data: Any = None,
+        query: dict | None = None,
+        **kwargs,
+    ) -> tuple[int, Any]:
+        path = reverse(route, kwargs=kwargs)
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        start = time.perf_counter()
+        status, body, queries = self._send(method, path, data)
+        self.samples.append(Sample(route, status, time.perf_counter() - start, queries))
+        return status, body
+
+    @abstractmethod
+    def _send(self, method: str, path: str, data: Any) -> tuple[int, Any, int | None]:
+        """Returns the status, the JSON body and the number of queries of the request, when they can be counted."""
+
+    def close(self) -> None:
+        pass
+
+
+class InProcessClient(BenchmarkClient):
+    # Requests go through the Django test client in this process, so queries are counted per request
+
+    def __init__(self):
+        super().__init__()
+        self._client = Client()
+
+    def _send(self, method, path, data):
+        with CaptureQueriesContext(connection) as context:
+            if data is None:
+                response = getattr(self._client, method)(path)
+            else:
+                response = getattr(self._client, method)(
+                    path, data=data, content_type="application/json"
+                )
+        body = (
+            response.json()
+            if response.get("Content-Type") == "application/json"
+            else None
+        )
+        return response.status_code, body, len(context.captured_queries)
+
+
+class HTTPClient(BenchmarkClient):
+    # Queries of a server can't be seen per request, they are read from its metrics endpoint by `read_route_queries`
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self._base_url = base_url.rstrip("/")
+        self._session = requests.Session()
+
+    def _send(self, method, path, data):
+        response = self._session.request(
+            method, self._base_url + path, json=data, timeout=30
+        )
+        body = (
+            response.json()
+            if response.headers.get("Content-Type") == "application/json"
+            else None
+        )
+        return response.status_code, body, None
+
+    def close(self):
+        self._session.close()
+
+
+def read_route_queries(base_url: str, token: str) -> dict[str, tuple[float, float]]:
+    # Responses and database queries per route, summed over every worker of the server
+    response = requests.get(
+        base_url.rstrip("/") + reverse("metrics"),
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=30,
+    )
+    response.raise_for_status()
+    totals: dict[str, list[float]] = {}
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if not match:
+            continue
+        name, route, value = match.groups()
+        if name == "gameapi_http_responses_total":
+            totals.setdefault(route, [0.0, 0.0])[0] += float(value)
+        elif name == "gameapi_db_queries_total":
+            totals.setdefault(route, [0.0, 0.0])[1] += float(value)
+    return {
+        route: (responses, queries) for route, (responses, queries) in totals.items()
+    }
+
+
+ClientFactory = Callable[[], BenchmarkClient]
@@ -0,0 +1,68 @@
+import random
+from collections.abc import Callable
+
+from gameapi.benchmarks.clients import BenchmarkClient
+from gameapi.constants import id_to_choice
+
+# Number of games created by one matchmaking burst
+MATCHMAKING_BURST_SIZE = 10
+# Number of rounds played in one multiplayer game
+MULTIPLAYER_ROUNDS = 5
+
+
+def _choice(rng: random.Random) -> dict:
+    return {"player": rng.choice(list(id_to_choice))}
+
+
+def computer_play(client: BenchmarkClient, rng: random.Random) -> None:
+    client.request("post", "play", _choice(rng))
+
+
+def matchmaking_burst(client: BenchmarkClient, rng: random.Random) -> None:
+    for _ in range(MATCHMAKING_BURST_SIZE):
+        client.request("post", "create_game")
+
+
+def multiplayer_rounds(client: BenchmarkClient, rng: random.Random) -> None:
+    # When other workers look for a game at the same time, the two seats can end up in different games. The game of
+    # the first seat is played from both sides then, the other player of it may be playing too
+    status, body = client.request("post", "create_game")
+    player_uuid = body["player_uuid"]
+    client.request("post", "create_game")
+    status, game = client.request("get", "multiplayer_game", player_uuid=player_uuid)
+    players = [game["player_1_uuid"], game["player_2_uuid"]]
+    cursor = game["next_cursor"] or 0
+    for _ in range(MULTIPLAYER_ROUNDS):
+        for player in players:
+            client.request("post", "multiplayer_game", _choice(rng), player_uuid=player)
+            status, game = client.request(
+                "get", "multiplayer_game", query={"since": cursor}, player_uuid=player
+            )
+            if status == 200:
+                cursor = game["next_cursor"] or cursor
+
+
+def scoreboard_read(client: BenchmarkClient, rng: random.Random) -> None:
+    client.request("get", "scoreboard")
+
+
+Scenario = Callable[[BenchmarkClient, random.Random], None]
+
+SCENARIOS: dict[str, Scenario] = {
+    "computer_play": computer_play,
+    "matchmaking_burst": matchmaking_burst,
+    "multiplayer_rounds": multiplayer_rounds,
+    "scoreboard_read": scoreboard_read,
+}
+
+# Traffic mixes, the weight of a scenario is how often it's picked relative to the other ones
+MIXES: dict[str, dict[str, int]] = {
+    "single_player": {"computer_play": 8, "scoreboard_read": 2},
+    "multiplayer": {"matchmaking_burst": 1, "multiplayer_rounds": 4},
+    "mixed": {
+        "computer_play": 5,
+        "matchmaking_burst": 1,
+        "multiplayer_rounds": 2,
+        "scoreboard_read": 2,
+    },
+}
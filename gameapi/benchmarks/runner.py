@@ -0,0 +1,204 @@
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from gameapi.benchmarks.clients import ClientFactory, Sample
+from gameapi.benchmarks.mixes import MIXES, SCENARIOS
+
+PERCENTILES = (50, 90, 99)
+
+
+def plan_scenarios(mix: str, scenarios: int, seed: int) -> list[str]:
+    # The same mix, number of scenarios and seed always replay the same traffic
+    weights = MIXES[mix]
+    return random.Random(seed).choices(
+        list(weights), weights=list(weights.values()), k=scenarios
+    )
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def run_benchmark(
+    client_factory: ClientFactory,
+    mix: str,
+    scenarios: int,
+    concurrency: int = 1,
+    seed: int = 0,
+) -> tuple[list[Sample], float]:
+    plan = plan_scenarios(mix, scenarios, seed)
+    samples: list[Sample] = []
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        client = client_factory()
+        try:
+            # Scenarios are dealt out in turns, every one has its own random choices so they don't depend on timing
+            for number in range(index, len(plan), concurrency):
+                SCENARIOS[plan[number]](client, random.Random(f"{seed}-{number}"))
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            client.close()
+            if concurrency > 1:
+                # every thread has database connections of its own
+                connections.close_all()
+            with lock:
+                samples.extend(client.samples)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    duration = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return samples, duration
+
+
+def build_report(
+    samples: list[Sample],
+    duration: float,
+    queries: dict[str, float] | None = None,
+    **meta,
+) -> dict:
+    """
+    Summarizes samples of a run per route.
+
+    `queries` holds the queries per request of routes when the samples don't have them, as for a server measured
+    through its metrics.
+    """
+    routes = {}
+    for route in sorted({sample.route for sample in samples}):
+        route_samples = [sample for sample in samples if sample.route == route]
+        latencies = [sample.latency * 1000 for sample in route_samples]
+        counted = [
+            sample.queries for sample in route_samples if sample.queries is not None
+        ]
+        if counted:
+            queries_per_request = sum(counted) / len(counted)
+        else:
+            queries_per_request = (queries or {}).get(route)
+        routes[route] = {
+            "requests": len(route_samples),
+            "statuses": dict(
+                sorted(Counter(str(sample.status) for sample in route_samples).items())
+            ),
+            "throughput": len(route_samples) / duration,
+            "latency_ms": {
+                f"p{percent}": percentile(latencies, percent) for percent in PERCENTILES
+            }
+            | {"mean": sum(latencies) / len(latencies), "max": max(latencies)},
+            "queries_per_request": queries_per_request,
+        }
+    latencies = [sample.latency * 1000 for sample in samples]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+            "created_at": timezone.now().isoformat(),
+        }
+        | meta,
+        "requests": len(samples),
+        "duration_s": duration,
+        "throughput": len(samples) / duration,
+        "latency_ms": {
+            f"p{percent}": percentile(latencies, percent) for percent in PERCENTILES
+        },
+        "routes": routes,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """
+    Returns the changes of throughput, p99 latency and queries per request between two reports, per route.
+
+    Changes for the worse by more than `tolerance` (a fraction) are marked as regressions.
+    """
+    lines = []
+
+    def change(name: str, before, after, higher_is_better: bool):
+        if before is None or after is None:
+            return
+        relative = (
+            (after - before) / before
+            if before
+            else (0.0 if after == before else math.inf)
+        )
+        worse = -relative if higher_is_better else relative
+        marker = "REGRESSION" if worse > tolerance else ""
+        lines.append(
+            f"{name:<48} {before:>12.2f} {after:>12.2f} {relative:>+9.1%} {marker}".rstrip()
+        )
+
+    for key in (
+        "target",
+        "serving_mode",
+        "api_profile",
+        "mix",
+        "scenarios",
+        "concurrency",
+        "seed",
+        "workers",
+    ):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            lines.append(
+                f"{key} differs: {baseline['meta'].get(key)} in the baseline, {current['meta'].get(key)} now"
+            )
+    change("total throughput", baseline["throughput"], current["throughput"], True)
+    for route in sorted(set(baseline["routes"]) | set(current["routes"])):
+        before = baseline["routes"].get(route)
+        after = current["routes"].get(route)
+        if before is None or after is None:
+            lines.append(
+                f"{route:<48} only in {'current' if before is None else 'baseline'}"
+            )
+            continue
+        change(f"{route} throughput", before["throughput"], after["throughput"], True)
+        change(
+            f"{route} p99 latency ms",
+            before["latency_ms"]["p99"],
+            after["latency_ms"]["p99"],
+            False,
+        )
+        change(
+            f"{route} queries per request",
+            before["queries_per_request"],
+            after["queries_per_request"],
+            False,
+        )
+    return lines
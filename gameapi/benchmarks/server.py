@@ -0,0 +1,77 @@
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+
+import requests
+from django.conf import settings
+from django.urls import reverse
+
+# Seconds to wait for a launched server to answer
+SERVER_START_TIMEOUT = 30
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_gunicorn(
+    workers: int,
+    serving_mode: str = "wsgi",
+    api_profile: str = "full",
+    preload: bool = True,
+    metrics_token: str = "",
+) -> Iterator[str]:
+    """Runs the app in gunicorn on a free local port and yields its base URL."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="gamerpssl-benchmark-") as metrics_dir:
+        # A fresh metrics directory, so the metrics of the server only count the benchmark
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--config",
+                "gunicorn.conf.py",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--workers",
+                str(workers),
+            ],
+            cwd=settings.BASE_DIR,
+            env=os.environ
+            | {
+                "METRICS_DIR": metrics_dir,
+                "SERVING_MODE": serving_mode,
+                "API_PROFILE": api_profile,
+                "PRELOAD_APP": str(preload),
+                "METRICS_TOKEN": metrics_token,
+            },
+        )
+        try:
+            _wait_until_ready(process, base_url)
+            yield base_url
+        finally:
+            process.terminate()
+            process.wait(timeout=SERVER_START_TIMEOUT)
+
+
+def _wait_until_ready(process: subprocess.Popen, base_url: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            requests.get(base_url + reverse("choices"), timeout=1)
+            return
+        except (requests.ConnectionError, requests.Timeout):
+            time.sleep(0.02)
+    raise RuntimeError(f"gunicorn didn't answer within {SERVER_START_TIMEOUT} seconds")
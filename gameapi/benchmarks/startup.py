@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.urls import reverse
+
+from gameapi.benchmarks.server import local_gunicorn
+
+# Loads the WSGI app in a fresh interpreter and sends it one request, the way a worker starts
+_FIRST_REQUEST_SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from GameRPSSL.wsgi import application
+loaded = time.perf_counter()
+environ = {"PATH_INFO": sys.argv[1]}
+setup_testing_defaults(environ)
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+end = time.perf_counter()
+print(json.dumps({"status": statuses[0], "load_app": loaded - start, "first_request": end - loaded, "at": time.time()}))
+"""
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(output: str) -> list[ImportTime]:
+    # Lines written by `python -X importtime`, the indentation is the depth of the import
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append(
+                ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2)
+            )
+    return imports
+
+
+def time_per_package(imports: list[ImportTime]) -> Counter:
+    # The self time of every module counts towards its top level package, so packages add up to the total
+    totals = Counter()
+    for item in imports:
+        totals[item.module.split(".")[0]] += item.self_us
+    return totals
+
+
+def measure_first_request() -> dict:
+    """Starts a fresh interpreter that loads the app and serves one request, with every import timed."""
+    started_at = time.time()
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            _FIRST_REQUEST_SCRIPT,
+            reverse("choices"),
+        ],
+        cwd=settings.BASE_DIR,
+        env=os.environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.splitlines()[-1])
+    return {
+        "status": result["status"],
+        "time_to_first_request": result["at"] - started_at,
+        "load_app": result["load_app"],
+        "first_request": result["first_request"],
+        "imports": parse_import_times(process.stderr),
+    }
+
+
+def measure_gunicorn_start(
+    workers: int, serving_mode: str, api_profile: str, preload: bool
+) -> float:
+    """Seconds from launching gunicorn until it answered a request."""
+    start = time.perf_counter()
+    with local_gunicorn(workers, serving_mode, api_profile, preload):
+        return time.perf_counter() - start
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+
+from gameapi.constants import code_to_result
+from gameapi.models import MultiplayerGame, Outcome
+
+# Last migration with the outcome table that has a text result and integer choices
+LEGACY_MIGRATION = ("gameapi", "0008_multiplayergame_version")
+
+LAYOUTS = ["legacy", "compact"]
+
+
+def _layout_models(layout: str) -> tuple[type, type]:
+    if layout == "compact":
+        return MultiplayerGame, Outcome
+    apps = MigrationLoader(connection).project_state(LEGACY_MIGRATION).apps
+    return apps.get_model("gameapi", "MultiplayerGame"), apps.get_model(
+        "gameapi", "Outcome"
+    )
+
+
+@contextmanager
+def _scratch_schema(name: str):
+    # Tables are created in a schema of their own, so they don't touch the app tables and the index names don't clash
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW search_path")
+        search_path = cursor.fetchone()[0]
+        cursor.execute(f"DROP SCHEMA IF EXISTS {name} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {name}")
+        cursor.execute(f"SET search_path TO {name}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET search_path TO {search_path}")
+            cursor.execute(f"DROP SCHEMA {name} CASCADE")
+
+
+def _fill(game_model: type, outcome_model: type, games: int, outcomes: int) -> None:
+    # Both layouts get the same outcomes: half of them belong to a game and they were created over the last 30 days
+    def column(name):
+        return connection.ops.quote_name(outcome_model._meta.get_field(name).column)
+
+    result = "1 + i %% 3"
+    if outcome_model._meta.get_field("result").get_internal_type() == "CharField":
+        values = ", ".join(
+            f"'{code_to_result[code].value}'" for code in sorted(code_to_result)
+        )
+        result = f"(ARRAY[{values}])[{result}]"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {game_model._meta.db_table} "
+            "(player_1_uuid, player_2_uuid, waiting_another_player, created_at, version) "
+            "SELECT md5('player_1_' || i)::uuid, md5('player_2_' || i)::uuid, false, now(), 0 "
+            "FROM generate_series(1, %s) AS i",
+            [games],
+        )
+        cursor.execute(
+            f"INSERT INTO {outcome_model._meta.db_table} "
+            f"({column('game')}, {column('result')}, {column('player_1_choice')}, "
+            f"{column('player_2_choice')}, {column('created_at')}) "
+            f"SELECT CASE WHEN i %% 2 = 0 THEN 1 + i %% %s END, {result}, 1 + i %% 5, 1 + i / 5 %% 5, "
+            "now() - (i %% 720) * interval '1 hour' FROM generate_series(1, %s) AS i",
+            [games, outcomes],
+        )
+        cursor.execute(f"VACUUM ANALYZE {outcome_model._meta.db_table}")
+
+
+def _sizes(model: type) -> dict:
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*), pg_relation_size(%s), pg_indexes_size(%s), pg_total_relation_size(%s) FROM {table}",
+            [table, table, table],
+        )
+        rows, table_bytes, index_bytes, total_bytes = cursor.fetchone()
+    return {
+        "rows": rows,
+        "table": table_bytes,
+        "indexes": index_bytes,
+        "total": total_bytes,
+    }
+
+
+def measure_storage(games: int, outcomes: int) -> dict:
+    """Stores the same synthetic outcomes with the text result and integer choices of migration 0008 and with the
+    small integers of the current model, and returns the size in bytes of the outcome table and its indexes per layout.
+
+    Postgres only, the tables are created in scratch schemas that are dropped again. It can't run in a transaction.
+    """
+    sizes = {}
+    for layout in LAYOUTS:
+        game_model, outcome_model = _layout_models(layout)
+        with _scratch_schema(f"storage_report_{layout}"):
+            with connection.schema_editor() as schema_editor:
+                schema_editor.create_model(game_model)
+                schema_editor.create_model(outcome_model)
+            _fill(game_model, outcome_model, games, outcomes)
+            sizes[layout] = _sizes(outcome_model)
+    return sizes
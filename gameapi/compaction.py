@@ -0,0 +1,179 @@
+from django.db import transaction
+
+from gameapi.constants import result_to_code
+
+# Outcomes move from the `Outcome` table of migration 0008, with a text result and integer choices, to the
+# `CompactOutcome` table of migration 0009, which stores them as small integers. Both tables get every write until the
+# cutover in migration 0010 drops the old one
+_RESULT_CODES = {result.value: code for result, code in result_to_code.items()}
+_CODE_RESULTS = {code: value for value, code in _RESULT_CODES.items()}
+
+
+def _result_case(expression: str, mapping: dict) -> str:
+    def literal(value):
+        return f"'{value}'" if isinstance(value, str) else str(value)
+
+    whens = " ".join(
+        f"WHEN {literal(key)} THEN {literal(value)}" for key, value in mapping.items()
+    )
+    return f"CASE {expression} {whens} END"
+
+
+def _tables(apps, to_compact: bool) -> tuple[type, type, dict]:
+    legacy = apps.get_model("gameapi", "Outcome")
+    compact = apps.get_model("gameapi", "CompactOutcome")
+    if to_compact:
+        return legacy, compact, _RESULT_CODES
+    return compact, legacy, _CODE_RESULTS
+
+
+def _columns(source: type, target: type, quote_name) -> str:
+    return ", ".join(
+        quote_name(target._meta.get_field(field.name).column)
+        for field in source._meta.concrete_fields
+    )
+
+
+def _converted(source: type, quote_name, prefix: str, results: dict) -> str:
+    # The columns of a source row in the order of `_columns`, with the result converted for the target table
+    return ", ".join(
+        (
+            _result_case(prefix + quote_name(field.column), results)
+            if field.name == "result"
+            else prefix + quote_name(field.column)
+        )
+        for field in source._meta.concrete_fields
+    )
+
+
+def _trigger_name(table: str) -> str:
+    return f"{table}_replicate"
+
+
+def create_replication_triggers(apps, schema_editor):
+    # Until the cutover every outcome inserted into or deleted from one table is inserted into or deleted from the
+    # other one too. The release that uses the old table and the one that uses the compact table can serve side by
+    # side, and either of them can be rolled back to. Outcomes are never updated
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote_name = schema_editor.quote_name
+    for to_compact in [True, False]:
+        source, target, results = _tables(apps, to_compact)
+        name = _trigger_name(source._meta.db_table)
+        target_table = quote_name(target._meta.db_table)
+        schema_editor.execute(
+            f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$\n"
+            "BEGIN\n"
+            "IF TG_OP = 'INSERT' THEN\n"
+            f"INSERT INTO {target_table} ({_columns(source, target, quote_name)}) "
+            f"VALUES ({_converted(source, quote_name, 'NEW.', results)}) ON CONFLICT (id) DO NOTHING;\n"
+            "RETURN NEW;\n"
+            "END IF;\n"
+            f"DELETE FROM {target_table} WHERE id = OLD.id;\n"
+            "RETURN OLD;\n"
+            "END\n"
+            "$$ LANGUAGE plpgsql"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {name} AFTER INSERT OR DELETE ON {quote_name(source._meta.db_table)} "
+            f"FOR EACH ROW EXECUTE FUNCTION {name}()"
+        )
+
+
+def drop_replication_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for to_compact in [True, False]:
+        table = _tables(apps, to_compact)[0]._meta.db_table
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS {_trigger_name(table)} ON {schema_editor.quote_name(table)}"
+        )
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {_trigger_name(table)}()")
+
+
+def _id_sequence(schema_editor, table: str) -> str | None:
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        return cursor.fetchone()[0]
+
+
+def _lock_tables(schema_editor, legacy: str, compact: str) -> int:
+    # Waits for the transactions that write outcomes and keeps new ones waiting until commit. Returns the largest id
+    # handed out, ids of deleted outcomes aren't used again
+    schema_editor.execute(f"LOCK TABLE {legacy}, {compact} IN SHARE ROW EXCLUSIVE MODE")
+    last_ids = [f"(SELECT max(id) FROM {legacy})", f"(SELECT max(id) FROM {compact})"]
+    for table in [legacy, compact]:
+        sequence = _id_sequence(schema_editor, table)
+        if sequence:
+            last_ids.append(f"(SELECT last_value FROM {sequence})")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT GREATEST({', '.join(last_ids)}, 0)")
+        return cursor.fetchone()[0]
+
+
+def share_id_sequence(apps, schema_editor):
+    # Both tables take their ids from the sequence of the compact one, so every outcome has the same id in both
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    legacy = apps.get_model("gameapi", "Outcome")._meta.db_table
+    compact = apps.get_model("gameapi", "CompactOutcome")._meta.db_table
+    with transaction.atomic(using=schema_editor.connection.alias):
+        last_id = _lock_tables(schema_editor, legacy, compact)
+        sequence = _id_sequence(schema_editor, compact)
+        schema_editor.execute("SELECT setval(%s, %s, false)", [sequence, last_id + 1])
+        schema_editor.execute(
+            f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {legacy} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)"
+        )
+
+
+def unshare_id_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    legacy = apps.get_model("gameapi", "Outcome")._meta.db_table
+    compact = apps.get_model("gameapi", "CompactOutcome")._meta.db_table
+    with transaction.atomic(using=schema_editor.connection.alias):
+        last_id = _lock_tables(schema_editor, legacy, compact)
+        schema_editor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+        schema_editor.execute(
+            f"ALTER TABLE {legacy} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY"
+        )
+        schema_editor.execute(
+            "SELECT setval(%s, %s, false)",
+            [_id_sequence(schema_editor, legacy), last_id + 1],
+        )
+
+
+def copy_outcomes(apps, connection, batch_size: int, to_compact: bool = True) -> int:
+    """Copies the outcomes that are missing in the compact table from the old one, or the other way around, and
+    returns the number of copied outcomes.
+
+    `apps` has to hold the models of migration 0009, which has both tables.
+    """
+    source, target, results = _tables(apps, to_compact)
+    quote_name = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote_name(target._meta.db_table)} ({_columns(source, target, quote_name)}) "
+        f"SELECT {_converted(source, quote_name, '', results)} FROM {quote_name(source._meta.db_table)} "
+        "WHERE id > %s AND id <= %s ON CONFLICT (id) DO NOTHING"
+    )
+    # Walks the source table once by id, outcomes added meanwhile are copied by the replication triggers
+    copied = 0
+    last_id = 0
+    while True:
+        with transaction.atomic(using=connection.alias):
+            ids = list(
+                source.objects.using(connection.alias)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [last_id, ids[-1]])
+                copied += cursor.rowcount
+        last_id = ids[-1]
+    return copied
@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class Result(Enum):
@@ -7,6 +7,11 @@ class Result(Enum):
     TIE = "tie"
 
 
+class Seat(IntEnum):
+    PLAYER_1 = 1
+    PLAYER_2 = 2
+
+
 class GameChoices(Enum):
     ROCK = "rock"
     PAPER = "paper"
@@ -24,3 +29,36 @@ choice_to_id = {
 }
 
 id_to_choice = {value: key for key, value in choice_to_id.items()}
+
+# Small integers that results are stored as
+result_to_code = {
+    Result.WIN: 1,
+    Result.LOSE: 2,
+    Result.TIE: 3,
+}
+
+code_to_result = {value: key for key, value in result_to_code.items()}
+
+# Upper bound on the number of rounds accepted by a single batch play request
+MAX_BATCH_PLAYS = 100
+
+# Number of latest outcomes shown on the scoreboard
+SCOREBOARD_SIZE = 10
+
+# Default and longest time in seconds a request waits for the next outcome of a multiplayer game
+OUTCOME_WAIT_TIMEOUT = 25
+MAX_OUTCOME_WAIT_TIMEOUT = 60
+
+# Default and largest number of outcomes returned in one page of a multiplayer game history
+OUTCOME_PAGE_SIZE = 50
+MAX_OUTCOME_PAGE_SIZE = 200
+
+# Default and longest time range in days of a statistics timeseries
+TIMESERIES_DEFAULT_DAYS = 1
+TIMESERIES_MAX_DAYS = 366
+
+# Number of outcomes copied in one transaction by `backfill_outcomes` and migration 0010
+COMPACT_BACKFILL_BATCH_SIZE = 5000
+
+# Time in seconds clients and proxies may cache the list of choices
+CHOICES_MAX_AGE = 24 * 60 * 60
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from gameapi.compaction import copy_outcomes
+from gameapi.constants import COMPACT_BACKFILL_BATCH_SIZE
+
+EXPAND_MIGRATION = ("gameapi", "0009_compactoutcome")
+CUTOVER_MIGRATION = ("gameapi", "0010_compactoutcome_cutover")
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the outcomes stored before migration 0009_compactoutcome into the table that stores results and "
+        "choices as small integers. Run it between that migration and the cutover migration"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=COMPACT_BACKFILL_BATCH_SIZE,
+            help="Number of outcomes copied in one transaction",
+        )
+
+    def handle(self, *args, **options):
+        loader = MigrationExecutor(connection).loader
+        if CUTOVER_MIGRATION in loader.applied_migrations:
+            self.stdout.write(
+                self.style.SUCCESS("The old outcome table is already dropped")
+            )
+            return
+        if EXPAND_MIGRATION not in loader.applied_migrations:
+            raise CommandError(
+                f"Run `python manage.py migrate gameapi {EXPAND_MIGRATION[1]}` first"
+            )
+        # The models of this release don't have the old table anymore, the ones of the migration still do
+        apps = loader.project_state(EXPAND_MIGRATION).apps
+        copied = copy_outcomes(apps, connection, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} outcomes"))
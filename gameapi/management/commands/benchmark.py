@@ -0,0 +1,168 @@
+import json
+import secrets
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gameapi.benchmarks.clients import HTTPClient, InProcessClient, read_route_queries
+from gameapi.benchmarks.mixes import MIXES
+from gameapi.benchmarks.runner import build_report, compare_reports, run_benchmark
+from gameapi.benchmarks.server import local_gunicorn
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a traffic mix against the API and reports throughput, latency percentiles and queries per request. "
+        "Outcomes and games are written to the database, which has to be allowed with --allow-writes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+        parser.add_argument(
+            "--target",
+            choices=["inprocess", "gunicorn"],
+            default="inprocess",
+            help="Send requests through the Django test client, or to a gunicorn server launched locally",
+        )
+        parser.add_argument(
+            "--url",
+            help="Send requests to an already running server instead of launching gunicorn",
+        )
+        parser.add_argument(
+            "--scenarios", type=int, default=200, help="Number of scenarios to play"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of clients playing scenarios at the same time",
+        )
+        parser.add_argument("--workers", type=int, default=3, help="gunicorn workers")
+        parser.add_argument(
+            "--serving-mode",
+            choices=["wsgi", "asgi"],
+            default="wsgi",
+            help="Serve the launched gunicorn with sync or uvicorn workers",
+        )
+        parser.add_argument(
+            "--api-profile",
+            choices=["full", "lean"],
+            default=settings.API_PROFILE,
+            help="Settings profile of the launched gunicorn",
+        )
+        parser.add_argument(
+            "--allow-writes",
+            action="store_true",
+            help="Confirm that games and outcomes may be written to the configured database, or to the one of --url",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", type=Path, help="Save the report as JSON")
+        parser.add_argument(
+            "--baseline", type=Path, help="Compare the report to a saved one"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.1,
+            help="Changes for the worse larger than this fraction are regressions",
+        )
+
+    def handle(self, *args, **options):
+        if not options["allow_writes"]:
+            raise CommandError(
+                "The benchmark writes games and outcomes to the database, point it to one used only for benchmarks "
+                "and pass --allow-writes"
+            )
+        if options["scenarios"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--scenarios and --concurrency have to be positive")
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(options["baseline"].read_text())
+
+        run = {
+            "mix": options["mix"],
+            "scenarios": options["scenarios"],
+            "concurrency": options["concurrency"],
+            "seed": options["seed"],
+        }
+        if options["url"]:
+            if not settings.METRICS_TOKEN:
+                raise CommandError(
+                    "Set METRICS_TOKEN to the token of the server, its queries are read from the metrics endpoint"
+                )
+            report = self._run_http(
+                options["url"], run, settings.METRICS_TOKEN, target="url"
+            )
+        elif options["target"] == "gunicorn":
+            metrics_token = secrets.token_urlsafe()
+            with local_gunicorn(
+                options["workers"],
+                options["serving_mode"],
+                options["api_profile"],
+                metrics_token=metrics_token,
+            ) as base_url:
+                report = self._run_http(
+                    base_url,
+                    run,
+                    metrics_token,
+                    target="gunicorn",
+                    workers=options["workers"],
+                    serving_mode=options["serving_mode"],
+                    api_profile=options["api_profile"],
+                )
+        else:
+            samples, duration = run_benchmark(InProcessClient, **run)
+            report = build_report(
+                samples,
+                duration,
+                target="inprocess",
+                api_profile=settings.API_PROFILE,
+                **run,
+            )
+
+        self._print_report(report)
+        if options["output"]:
+            options["output"].write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Saved report to {options['output']}")
+        if baseline is not None:
+            lines = compare_reports(baseline, report, options["tolerance"])
+            self.stdout.write(
+                f"\nCompared to {options['baseline']} ({baseline['meta'].get('commit')}):"
+            )
+            for line in lines:
+                style = self.style.ERROR if "REGRESSION" in line else str
+                self.stdout.write(style(line))
+
+    def _run_http(self, base_url: str, run: dict, metrics_token: str, **meta) -> dict:
+        before = read_route_queries(base_url, metrics_token)
+        samples, duration = run_benchmark(lambda: HTTPClient(base_url), **run)
+        after = read_route_queries(base_url, metrics_token)
+        queries = {}
+        for route, (responses, route_queries) in after.items():
+            previous_responses, previous_queries = before.get(route, (0.0, 0.0))
+            if responses > previous_responses:
+                queries[route] = (route_queries - previous_queries) / (
+                    responses - previous_responses
+                )
+        return build_report(samples, duration, queries, url=base_url, **meta, **run)
+
+    def _print_report(self, report: dict) -> None:
+        self.stdout.write(
+            f"{report['requests']} requests in {report['duration_s']:.2f}s, "
+            f"{report['throughput']:.1f} requests/s, "
+            + ", ".join(
+                f"{name} {value:.1f}ms" for name, value in report["latency_ms"].items()
+            )
+        )
+        self.stdout.write(
+            f"{'route':<20} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>8}"
+        )
+        for route, stats in report["routes"].items():
+            latency = stats["latency_ms"]
+            queries = stats["queries_per_request"]
+            self.stdout.write(
+                f"{route:<20} {stats['requests']:>8} {stats['throughput']:>9.1f} {latency['p50']:>8.1f} "
+                f"{latency['p90']:>8.1f} {latency['p99']:>8.1f} "
+                f"{'-' if queries is None else f'{queries:.1f}':>8}"
+            )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gameapi.api.schema import dump_schema, generate_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates the OpenAPI schema served at schema/ into OPENAPI_SCHEMA_FILE. The file is committed, "
+        "so it has to be rebuilt whenever views or serializers change"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if the file differs from the schema of the code instead of writing it",
+        )
+
+    def handle(self, *args, **options):
+        path = settings.OPENAPI_SCHEMA_FILE
+        content = dump_schema(generate_schema())
+        if options["check"]:
+            if not path.exists() or path.read_text() != content:
+                raise CommandError(
+                    f"{path} is out of date, run `python manage.py build_schema`"
+                )
+            self.stdout.write(self.style.SUCCESS(f"{path} is up to date"))
+            return
+        path.write_text(content)
+        self.stdout.write(self.style.SUCCESS(f"Schema is written to {path}"))
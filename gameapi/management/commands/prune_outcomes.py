@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gameapi.retention import prune_outcomes
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes single player outcomes that are older than the retention period or were removed from the "
+        "scoreboard, keeping their counts in the archived outcome statistics"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.OUTCOME_RETENTION_DAYS,
+            help="Keep outcomes of the last DAYS days",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.OUTCOME_RETENTION_BATCH_SIZE,
+            help="Number of outcomes deleted in one transaction",
+        )
+
+    def handle(self, *args, **options):
+        pruned = prune_outcomes(
+            older_than=timezone.now() - timedelta(days=options["days"]),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} outcomes"))
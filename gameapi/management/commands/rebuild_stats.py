@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from gameapi.stats import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the game statistics counters from stored and archived outcomes"
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        self.stdout.write(self.style.SUCCESS("Statistics counters are rebuilt"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from gameapi.rollups import rollup_outcomes
+
+
+class Command(BaseCommand):
+    help = "Aggregates outcomes into hourly rollups used by the statistics timeseries"
+
+    def handle(self, *args, **options):
+        rollups = rollup_outcomes()
+        self.stdout.write(self.style.SUCCESS(f"Updated {rollups} hourly rollups"))
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gameapi.benchmarks.startup import (
+    measure_first_request,
+    measure_gunicorn_start,
+    time_per_package,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts the app in a fresh interpreter and reports the time to its first request and where the time "
+        "importing modules goes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="Number of fresh starts, the one with the median time to first request is reported",
+        )
+        parser.add_argument(
+            "--top", type=int, default=15, help="Number of packages and modules listed"
+        )
+        parser.add_argument(
+            "--gunicorn",
+            action="store_true",
+            help="Also launch gunicorn with and without preloading the app and time its first answer",
+        )
+        parser.add_argument("--workers", type=int, default=3, help="gunicorn workers")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs has to be positive")
+        results = sorted(
+            (measure_first_request() for _ in range(options["runs"])),
+            key=lambda result: result["time_to_first_request"],
+        )
+        result = results[len(results) // 2]
+        imports = result["imports"]
+        self.stdout.write(
+            f"Time to first request {result['time_to_first_request'] * 1000:.1f}ms: "
+            f"loading the app {result['load_app'] * 1000:.1f}ms, "
+            f"first request {result['first_request'] * 1000:.1f}ms ({result['status']}), "
+            f"median of {len(results)} starts"
+        )
+        total = sum(item.self_us for item in imports)
+        self.stdout.write(f"{len(imports)} modules imported in {total / 1000:.1f}ms")
+
+        self.stdout.write(f"\n{'package':<40} {'ms':>8} {'share':>7}")
+        for package, self_us in time_per_package(imports).most_common(options["top"]):
+            self.stdout.write(
+                f"{package:<40} {self_us / 1000:>8.1f} {self_us / total:>7.1%}"
+            )
+
+        # Imports made by the app itself, with everything they imported in turn
+        self.stdout.write(f"\n{'module, including its imports':<40} {'ms':>8}")
+        slowest = sorted(imports, key=lambda item: item.cumulative_us, reverse=True)
+        for item in slowest[: options["top"]]:
+            self.stdout.write(f"{item.module:<40} {item.cumulative_us / 1000:>8.1f}")
+
+        if options["gunicorn"]:
+            self.stdout.write(
+                f"\ngunicorn with {options['workers']} workers, "
+                f"{settings.SERVING_MODE}, {settings.API_PROFILE} profile:"
+            )
+            for preload in [False, True]:
+                seconds = measure_gunicorn_start(
+                    options["workers"],
+                    settings.SERVING_MODE,
+                    settings.API_PROFILE,
+                    preload,
+                )
+                self.stdout.write(
+                    f"{'preloaded' if preload else 'not preloaded':<14} first answer after {seconds * 1000:.0f}ms"
+                )
+        self.stdout.write(self.style.SUCCESS("Startup report is done"))
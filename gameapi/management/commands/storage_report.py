@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from gameapi.benchmarks.storage import LAYOUTS, measure_storage
+
+
+def megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f}MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores the same synthetic outcomes with a text result and integer choices and with small integers, and "
+        "reports the size of the outcome table and its indexes. Needs Postgres, the tables are created in scratch "
+        "schemas that are dropped afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--games",
+            type=int,
+            default=100_000,
+            help="Number of games the outcomes belong to",
+        )
+        parser.add_argument(
+            "--outcomes", type=int, default=1_000_000, help="Number of outcomes"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The storage report needs a Postgres database")
+        sizes = measure_storage(options["games"], options["outcomes"])
+
+        self.stdout.write(
+            f"{'outcomes':<8} {'rows':>10} {'table':>10} {'indexes':>10} {'total':>10} {'bytes/row':>10}"
+        )
+        for layout in LAYOUTS:
+            size = sizes[layout]
+            self.stdout.write(
+                f"{layout:<8} {size['rows']:>10} {megabytes(size['table']):>10} "
+                f"{megabytes(size['indexes']):>10} {megabytes(size['total']):>10} "
+                f"{size['total'] / max(size['rows'], 1):>10.1f}"
+            )
+        legacy, compact = (sizes[layout] for layout in LAYOUTS)
+        saved = {key: legacy[key] - compact[key] for key in legacy}
+        self.stdout.write(
+            f"{'saved':<8} {'':>10} {megabytes(saved['table']):>10} {megabytes(saved['indexes']):>10} "
+            f"{megabytes(saved['total']):>10} {saved['total'] / max(legacy['rows'], 1):>10.1f}"
+        )
+        self.stdout.write(
+            f"{1 - compact['total'] / legacy['total']:.1%} of the total size and "
+            f"{1 - compact['table'] / legacy['table']:.1%} of the table without its indexes saved"
+        )
+        self.stdout.write(self.style.SUCCESS("Storage report is done"))
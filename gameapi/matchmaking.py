@@ -0,0 +1,23 @@
+from django.db import transaction
+
+from gameapi.constants import Seat
+from gameapi.models import MultiplayerGame, PlayerSeat
+
+
+def join_game() -> PlayerSeat:
+    # Open seats that are being claimed by another request are skipped instead of waited on, so concurrent requests
+    # never queue on the same row. A request that finds no free seat opens a new game
+    with transaction.atomic():
+        game = (
+            MultiplayerGame.objects.select_for_update(skip_locked=True)
+            .filter(waiting_another_player=True)
+            .order_by("id")
+            .first()
+        )
+        if game is None:
+            game = MultiplayerGame.objects.create()
+            return PlayerSeat(game=game, seat=Seat.PLAYER_1)
+        game.waiting_another_player = False
+        game.version += 1
+        game.save(update_fields=["waiting_another_player", "version"])
+    return PlayerSeat(game=game, seat=Seat.PLAYER_2)
@@ -0,0 +1,408 @@
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+
+# Upper bounds in seconds of the request duration histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+# Requests that didn't match a named route
+OTHER_ROUTE = "other"
+
+# Offsets of the values every route has in a metrics file
+_RESPONSES = 0
+_BUCKETS = _RESPONSES + len(STATUS_CLASSES)
+_DURATION = _BUCKETS + len(LATENCY_BUCKETS) + 1
+_QUERIES = _DURATION + 1
+_QUERY_TIME = _QUERIES + 1
+_SERIALIZATION_TIME = _QUERY_TIME + 1
+_RENDER_TIME = _SERIALIZATION_TIME + 1
+_ROUTE_SIZE = _RENDER_TIME + 1
+
+# Statistics of the psycopg connection pool every worker keeps after its routes. Gauges are only summed over workers
+# that are still running, counters are totals since each worker opened its pool
+POOL_GAUGES = ("pool_max", "pool_size", "pool_available", "requests_waiting")
+POOL_COUNTERS = (
+    "requests_num",
+    "requests_queued",
+    "requests_wait_ms",
+    "requests_errors",
+    "returns_bad",
+    "connections_num",
+    "connections_ms",
+    "connections_errors",
+    "connections_lost",
+)
+POOL_STATS = POOL_GAUGES + POOL_COUNTERS
+
+# Seconds between updates of the pool statistics of a worker
+POOL_STATS_INTERVAL = 1.0
+
+# The file starts with the JSON list of routes its values belong to
+_HEADER_SIZE = 4096
+_VALUE_SIZE = 8
+# Values of stopped workers are added to this file when a worker starts and their own files are removed, so the totals
+# don't drop. Pool gauges aren't kept, they only count running workers
+_ARCHIVE_NAME = "metrics-archive.bin"
+# Held shared while the files are read and exclusively while files of stopped workers are moved into the archive
+_LOCK_NAME = "metrics.lock"
+
+
+class RequestTimings:
+    """Time one request spent in the database, in serializers and in rendering."""
+
+    __slots__ = ("queries", "query_time", "serialization_time", "render_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serialization_time = 0.0
+        self.render_time = 0.0
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # Connected to connection_created, so every database connection is measured without per request setup
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+def timed_execute(execute, sql, params, many, context):
+    # Only queries made while a request is recorded are measured
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.query_time += time.perf_counter() - start
+
+
+@contextmanager
+def measure_serialization():
+    timings = current_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.serialization_time += time.perf_counter() - start
+
+
+@contextmanager
+def measure_rendering():
+    timings = current_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.render_time += time.perf_counter() - start
+
+
+def get_pool_stats() -> dict[str, int] | None:
+    # Only Postgres databases configured with a pool have one
+    pool = getattr(connection, "pool", None)
+    return pool.get_stats() if pool is not None else None
+
+
+def get_route_names() -> list[str]:
+    names = []
+
+    def collect(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                collect(pattern.url_patterns)
+            elif pattern.name and pattern.name not in names:
+                names.append(pattern.name)
+
+    collect(get_resolver().url_patterns)
+    return names + [OTHER_ROUTE]
+
+
+class MetricsRegistry:
+    """
+    Request metrics of every worker process, each in its own memory mapped file in `directory`.
+
+    A worker only adds to its own file, so recording a request takes no lock shared with other processes. The files
+    of all workers are summed when the metrics are collected.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+        self._values: memoryview | None = None
+        self._slots: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Files are per process, a forked worker opens its own
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        routes = get_route_names()
+        header = _header(routes)
+        size = _HEADER_SIZE + _values_size(routes)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._directory / f"metrics-{os.getpid()}.bin"
+        with self._locked(fcntl.LOCK_EX):
+            # A file with the pid of this process was left by an earlier process, it is archived like the others
+            self._archive_stopped(path)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+                mapping = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        self._values = memoryview(mapping)[_HEADER_SIZE:].cast("d")
+        self._slots = {route: i * _ROUTE_SIZE for i, route in enumerate(routes)}
+        self._pool_slot = len(routes) * _ROUTE_SIZE
+
+    @contextmanager
+    def _locked(self, operation: int):
+        fd = os.open(self._directory / _LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def _archive_stopped(self, own_path: Path) -> None:
+        archive_path = self._directory / _ARCHIVE_NAME
+        stopped = []
+        for path in self._directory.glob("metrics-*.bin"):
+            pid = path.stem.removeprefix("metrics-")
+            if path == own_path or (pid.isdigit() and not _is_running(int(pid))):
+                stopped.append(path)
+        if not stopped:
+            return
+        totals = {}
+        pool_totals = [0.0] * len(POOL_STATS)
+        for path in [archive_path] + stopped:
+            content = _read(path)
+            if content is None:
+                continue
+            routes, values = content
+            for i, route in enumerate(routes):
+                route_totals = totals.setdefault(route, [0.0] * _ROUTE_SIZE)
+                for offset in range(_ROUTE_SIZE):
+                    route_totals[offset] += values[i * _ROUTE_SIZE + offset]
+            for i, name in enumerate(POOL_STATS):
+                if name in POOL_COUNTERS:
+                    pool_totals[i] += values[len(routes) * _ROUTE_SIZE + i]
+        data = array("d", [value for values in totals.values() for value in values])
+        data.extend(pool_totals)
+        temporary_path = archive_path.with_suffix(".tmp")
+        temporary_path.write_bytes(_header(list(totals)) + data.tobytes())
+        os.replace(temporary_path, archive_path)
+        for path in stopped:
+            path.unlink(missing_ok=True)
+
+    def _ensure_open(self) -> None:
+        if self._values is None:
+            with self._lock:
+                if self._values is None:
+                    self._open()
+
+    def observe(
+        self,
+        route: str | None,
+        status_code: int,
+        duration: float,
+        timings: RequestTimings,
+    ) -> None:
+        self._ensure_open()
+        slot = self._slots.get(route)
+        if slot is None:
+            slot = self._slots[OTHER_ROUTE]
+        values = self._values
+        with self._lock:
+            values[slot + _RESPONSES + min(max(status_code // 100 - 1, 0), 4)] += 1
+            values[slot + _BUCKETS + bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+            values[slot + _DURATION] += duration
+            values[slot + _QUERIES] += timings.queries
+            values[slot + _QUERY_TIME] += timings.query_time
+            values[slot + _SERIALIZATION_TIME] += timings.serialization_time
+            values[slot + _RENDER_TIME] += timings.render_time
+
+    def record_pool_stats(self, stats: dict[str, int]) -> None:
+        # The pool statistics are totals of this worker, they replace the previous ones
+        self._ensure_open()
+        values = self._values
+        with self._lock:
+            for i, name in enumerate(POOL_STATS):
+                values[self._pool_slot + i] = stats.get(name, 0)
+
+    def collect(self) -> dict[str, list[float]]:
+        return self._collect()[0]
+
+    def _collect(self) -> tuple[dict[str, list[float]], dict[str, float]]:
+        totals = {}
+        pool_totals = dict.fromkeys(POOL_STATS, 0.0)
+        if not self._directory.is_dir():
+            return totals, pool_totals
+        with self._locked(fcntl.LOCK_SH):
+            contents = [
+                (path, _read(path))
+                for path in sorted(self._directory.glob("metrics-*.bin"))
+            ]
+        for path, content in contents:
+            if content is None:
+                continue
+            routes, values = content
+            for i, route in enumerate(routes):
+                route_totals = totals.setdefault(route, [0.0] * _ROUTE_SIZE)
+                for offset in range(_ROUTE_SIZE):
+                    route_totals[offset] += values[i * _ROUTE_SIZE + offset]
+            pid = path.stem.removeprefix("metrics-")
+            running = pid.isdigit() and _is_running(int(pid))
+            for i, name in enumerate(POOL_STATS):
+                if running or name in POOL_COUNTERS:
+                    pool_totals[name] += values[len(routes) * _ROUTE_SIZE + i]
+        return totals, pool_totals
+
+    def export(self) -> str:
+        # Prometheus text exposition format, routes without requests are left out
+        route_totals, pool_totals = self._collect()
+        totals = {
+            route: values
+            for route, values in route_totals.items()
+            if sum(values[_RESPONSES:_BUCKETS])
+        }
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        metric(
+            "gameapi_http_responses_total",
+            "counter",
+            "Responses per route and status class.",
+        )
+        for route, values in totals.items():
+            for i, status_class in enumerate(STATUS_CLASSES):
+                if values[_RESPONSES + i]:
+                    lines.append(
+                        f'gameapi_http_responses_total{{route="{route}",status="{status_class}"}} '
+                        f"{_format(values[_RESPONSES + i])}"
+                    )
+
+        metric(
+            "gameapi_http_request_duration_seconds",
+            "histogram",
+            "Time from receiving a request until its response was rendered.",
+        )
+        for route, values in totals.items():
+            count = 0.0
+            for i, bound in enumerate(LATENCY_BUCKETS + (float("inf"),)):
+                count += values[_BUCKETS + i]
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'gameapi_http_request_duration_seconds_bucket{{route="{route}",le="{le}"}} {_format(count)}'
+                )
+            lines.append(
+                f'gameapi_http_request_duration_seconds_sum{{route="{route}"}} {_format(values[_DURATION])}'
+            )
+            lines.append(
+                f'gameapi_http_request_duration_seconds_count{{route="{route}"}} {_format(count)}'
+            )
+
+        for name, offset, help_text in [
+            ("gameapi_db_queries_total", _QUERIES, "Database queries per route."),
+            (
+                "gameapi_db_query_seconds_total",
+                _QUERY_TIME,
+                "Time spent in database queries per route.",
+            ),
+            (
+                "gameapi_serialization_seconds_total",
+                _SERIALIZATION_TIME,
+                "Time spent serializing responses per route.",
+            ),
+            (
+                "gameapi_render_seconds_total",
+                _RENDER_TIME,
+                "Time spent rendering responses per route.",
+            ),
+        ]:
+            metric(name, "counter", help_text)
+            for route, values in totals.items():
+                lines.append(f'{name}{{route="{route}"}} {_format(values[offset])}')
+
+        if pool_totals["pool_max"]:
+            # Without a connection pool these would all be zero
+            for stat in POOL_STATS:
+                name, value = stat.removeprefix("pool_"), pool_totals[stat]
+                if name.endswith("_ms"):
+                    name, value = name.removesuffix("_ms") + "_seconds", value / 1000
+                if stat in POOL_GAUGES:
+                    name = f"gameapi_db_pool_{name}"
+                    metric(
+                        name, "gauge", "Connection pool statistic of running workers."
+                    )
+                else:
+                    name = f"gameapi_db_pool_{name}_total"
+                    metric(name, "counter", "Connection pool statistic of all workers.")
+                lines.append(f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(routes: list[str]) -> bytes:
+    header = json.dumps(routes).encode()
+    if len(header) > _HEADER_SIZE:
+        raise ValueError(
+            f"The route names take {len(header)} bytes, metrics files have room for {_HEADER_SIZE}"
+        )
+    return header.ljust(_HEADER_SIZE)
+
+
+def _read(path: Path) -> tuple[list[str], memoryview] | None:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    routes = json.loads(data[:_HEADER_SIZE])
+    if len(data) != _HEADER_SIZE + _values_size(routes):
+        return None
+    return routes, memoryview(data[_HEADER_SIZE:]).cast("d")
+
+
+def _values_size(routes: list[str]) -> int:
+    return (len(routes) * _ROUTE_SIZE + len(POOL_STATS)) * _VALUE_SIZE
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+metrics = MetricsRegistry(settings.METRICS_DIR)
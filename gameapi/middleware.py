@@ -0,0 +1,77 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from gameapi.metrics import (
+    POOL_STATS_INTERVAL,
+    RequestTimings,
+    current_timings,
+    get_pool_stats,
+    metrics,
+)
+
+
+class MetricsMiddleware:
+    """Records the duration, database queries, serialization and rendering time of every request per route."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pool_stats_at = 0.0
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self._observe(request, response, start, timings)
+        return response
+
+    async def __acall__(self, request):
+        # Queries of async views run in other threads with a copy of the context, they are measured too
+        start = time.perf_counter()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self._observe(request, response, start, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returned
+        timings = current_timings.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.render_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _observe(self, request, response, start, timings):
+        resolver_match = getattr(request, "resolver_match", None)
+        end = time.perf_counter()
+        metrics.observe(
+            resolver_match.url_name if resolver_match else None,
+            response.status_code,
+            end - start,
+            timings,
+        )
+        if end - self.pool_stats_at >= POOL_STATS_INTERVAL:
+            self.pool_stats_at = end
+            pool_stats = get_pool_stats()
+            if pool_stats is not None:
+                metrics.record_pool_stats(pool_stats)
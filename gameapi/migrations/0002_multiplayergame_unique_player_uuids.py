@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:18
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="multiplayergame",
+            name="player_1_uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="multiplayergame",
+            name="player_2_uuid",
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0002_multiplayergame_unique_player_uuids"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="multiplayergame",
+            index=models.Index(
+                condition=models.Q(("waiting_another_player", True)),
+                fields=["id"],
+                name="multiplayergame_waiting_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0003_multiplayergame_waiting_idx"),
+    ]
+
+    operations = [
+        # The new index is created before the single column one is dropped
+        migrations.AddIndex(
+            model_name="outcome",
+            index=models.Index(fields=["game", "id"], name="outcome_game_id_idx"),
+        ),
+        migrations.AlterField(
+            model_name="outcome",
+            name="game",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="outcomes",
+                to="gameapi.multiplayergame",
+            ),
+        ),
+    ]
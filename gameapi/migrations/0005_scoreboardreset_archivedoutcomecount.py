@@ -0,0 +1,92 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:25
+
+import django.core.validators
+import gameapi.constants
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0004_outcome_game_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScoreboardReset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_outcome_id", models.BigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedOutcomeCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "result",
+                    models.CharField(
+                        choices=[
+                            (
+                                gameapi.constants.Result["WIN"],
+                                gameapi.constants.Result["WIN"],
+                            ),
+                            (
+                                gameapi.constants.Result["LOSE"],
+                                gameapi.constants.Result["LOSE"],
+                            ),
+                            (
+                                gameapi.constants.Result["TIE"],
+                                gameapi.constants.Result["TIE"],
+                            ),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "player_1_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                (
+                    "player_2_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("result", "player_1_choice", "player_2_choice"),
+                        name="archivedoutcomecount_unique_key",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:26
+
+import django.core.validators
+import gameapi.constants
+from django.db import migrations, models
+
+# Frozen copy of the counter seeding as it was when this migration was written, so the rows it creates don't change
+# with the code or the settings. Choice ids are 1 to 5, and every pair below is a win of the first choice
+SHARDS = 8
+CHOICE_IDS = range(1, 6)
+WINS = {(1, 3), (1, 5), (2, 1), (2, 4), (3, 2), (3, 5), (4, 1), (4, 3), (5, 2), (5, 4)}
+
+
+def _result(player_1_choice, player_2_choice):
+    if player_1_choice == player_2_choice:
+        return "tie"
+    return "win" if (player_1_choice, player_2_choice) in WINS else "lose"
+
+
+def create_counters(apps, schema_editor):
+    OutcomeCounter = apps.get_model("gameapi", "OutcomeCounter")
+    OutcomeCounter.objects.bulk_create(
+        [
+            OutcomeCounter(
+                multiplayer=multiplayer,
+                shard=shard,
+                result=_result(player_1_choice, player_2_choice),
+                player_1_choice=player_1_choice,
+                player_2_choice=player_2_choice,
+            )
+            for multiplayer in (False, True)
+            for player_1_choice in CHOICE_IDS
+            for player_2_choice in CHOICE_IDS
+            for shard in range(SHARDS)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0005_scoreboardreset_archivedoutcomecount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutcomeCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("multiplayer", models.BooleanField()),
+                ("shard", models.PositiveSmallIntegerField()),
+                (
+                    "result",
+                    models.CharField(
+                        choices=[
+                            (
+                                gameapi.constants.Result["WIN"],
+                                gameapi.constants.Result["WIN"],
+                            ),
+                            (
+                                gameapi.constants.Result["LOSE"],
+                                gameapi.constants.Result["LOSE"],
+                            ),
+                            (
+                                gameapi.constants.Result["TIE"],
+                                gameapi.constants.Result["TIE"],
+                            ),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "player_1_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                (
+                    "player_2_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "multiplayer",
+                            "result",
+                            "player_1_choice",
+                            "player_2_choice",
+                            "shard",
+                        ),
+                        name="outcomecounter_unique_key",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:29
+
+import django.core.validators
+import gameapi.constants
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0006_outcomecounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutcomeHourlyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("multiplayer", models.BooleanField()),
+                (
+                    "result",
+                    models.CharField(
+                        choices=[
+                            (
+                                gameapi.constants.Result["WIN"],
+                                gameapi.constants.Result["WIN"],
+                            ),
+                            (
+                                gameapi.constants.Result["LOSE"],
+                                gameapi.constants.Result["LOSE"],
+                            ),
+                            (
+                                gameapi.constants.Result["TIE"],
+                                gameapi.constants.Result["TIE"],
+                            ),
+                        ],
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "player_1_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                (
+                    "player_2_choice",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OutcomeRollupCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("processed_until", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="outcome",
+            index=models.Index(fields=["created_at"], name="outcome_created_at_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="outcomehourlyrollup",
+            constraint=models.UniqueConstraint(
+                fields=(
+                    "bucket",
+                    "multiplayer",
+                    "result",
+                    "player_1_choice",
+                    "player_2_choice",
+                ),
+                name="outcomehourlyrollup_unique_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0007_outcomehourlyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="multiplayergame",
+            name="version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:12
+
+import django.core.validators
+import django.db.models.deletion
+import gameapi.constants
+import gameapi.models
+from django.db import migrations, models
+
+from gameapi.compaction import (
+    create_replication_triggers,
+    drop_replication_triggers,
+    share_id_sequence,
+    unshare_id_sequence,
+)
+
+
+class Migration(migrations.Migration):
+    # Expand step of storing outcomes with a small integer result and choices. Dropping and adding columns would keep
+    # the rows as large as before, Postgres reserves room for dropped columns in every row. The outcomes are copied
+    # into a new table instead: every write reaches both tables and `python manage.py backfill_outcomes` copies
+    # the existing outcomes. 0010 is the cutover
+
+    dependencies = [
+        ("gameapi", "0008_multiplayergame_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompactOutcome",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "game",
+                    models.ForeignKey(
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="gameapi.multiplayergame",
+                    ),
+                ),
+                (
+                    "result",
+                    gameapi.models.ResultField(
+                        choices=[
+                            (
+                                gameapi.constants.Result["WIN"],
+                                gameapi.constants.Result["WIN"],
+                            ),
+                            (
+                                gameapi.constants.Result["LOSE"],
+                                gameapi.constants.Result["LOSE"],
+                            ),
+                            (
+                                gameapi.constants.Result["TIE"],
+                                gameapi.constants.Result["TIE"],
+                            ),
+                        ]
+                    ),
+                ),
+                (
+                    "player_1_choice",
+                    models.SmallIntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                (
+                    "player_2_choice",
+                    models.SmallIntegerField(
+                        validators=[
+                            django.core.validators.MaxValueValidator(5),
+                            django.core.validators.MinValueValidator(1),
+                        ]
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "gameapi_outcome_compact",
+                "indexes": [
+                    models.Index(
+                        fields=["game", "id"], name="outcome_compact_game_id_idx"
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="outcome_compact_created_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(share_id_sequence, unshare_id_sequence),
+        migrations.RunPython(create_replication_triggers, drop_replication_triggers),
+    ]
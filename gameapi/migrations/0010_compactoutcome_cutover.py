@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from gameapi.compaction import (
+    copy_outcomes,
+    create_replication_triggers,
+    drop_replication_triggers,
+    share_id_sequence,
+)
+from gameapi.constants import COMPACT_BACKFILL_BATCH_SIZE
+
+
+def copy_to_compact(apps, schema_editor):
+    copy_outcomes(apps, schema_editor.connection, COMPACT_BACKFILL_BATCH_SIZE)
+
+
+def copy_to_legacy(apps, schema_editor):
+    copy_outcomes(
+        apps, schema_editor.connection, COMPACT_BACKFILL_BATCH_SIZE, to_compact=False
+    )
+
+
+class Migration(migrations.Migration):
+    # Cutover of storing outcomes with a small integer result and choices, applied once every worker runs the release
+    # that uses the compact table. Outcomes that weren't copied yet are copied in batches that commit on their own,
+    # then the old table is dropped. Rolling it back copies the outcomes back into a new old table
+    atomic = False
+
+    dependencies = [
+        ("gameapi", "0009_compactoutcome"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_compact, copy_to_legacy),
+        migrations.RunPython(drop_replication_triggers, create_replication_triggers),
+        migrations.RunPython(migrations.RunPython.noop, share_id_sequence),
+        migrations.DeleteModel(
+            name="Outcome",
+        ),
+        # The table name of the compact outcomes is set, so only the model is renamed
+        migrations.RenameModel(
+            old_name="CompactOutcome",
+            new_name="Outcome",
+        ),
+        migrations.AlterField(
+            model_name="outcome",
+            name="game",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="outcomes",
+                to="gameapi.multiplayergame",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0010_compactoutcome_cutover"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="outcome",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
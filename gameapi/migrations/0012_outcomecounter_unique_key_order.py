@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0011_outcome_created_at"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="outcomecounter",
+            name="outcomecounter_unique_key",
+        ),
+        migrations.AddConstraint(
+            model_name="outcomecounter",
+            constraint=models.UniqueConstraint(
+                fields=(
+                    "result",
+                    "player_1_choice",
+                    "player_2_choice",
+                    "shard",
+                    "multiplayer",
+                ),
+                name="outcomecounter_unique_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,166 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:23
+
+import django.core.validators
+import gameapi.constants
+import gameapi.models
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+COUNT_MODELS = ["ArchivedOutcomeCount", "OutcomeCounter", "OutcomeHourlyRollup"]
+# Frozen copy of the result codes of `gameapi.constants.result_to_code`
+RESULT_CODES = {"win": "1", "lose": "2", "tie": "3"}
+
+
+def _convert_results(apps, mapping: dict) -> None:
+    for model_name in COUNT_MODELS:
+        apps.get_model("gameapi", model_name).objects.update(
+            result=Case(
+                *[When(result=old, then=Value(new)) for old, new in mapping.items()]
+            )
+        )
+
+
+def results_to_codes(apps, schema_editor):
+    # The text results are replaced by their codes, so the columns can be cast to small integers
+    _convert_results(apps, RESULT_CODES)
+
+
+def codes_to_results(apps, schema_editor):
+    _convert_results(apps, {code: result for result, code in RESULT_CODES.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gameapi", "0012_outcomecounter_unique_key_order"),
+    ]
+
+    operations = [
+        migrations.RunPython(results_to_codes, codes_to_results),
+        migrations.AlterField(
+            model_name="archivedoutcomecount",
+            name="player_1_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="archivedoutcomecount",
+            name="player_2_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="archivedoutcomecount",
+            name="result",
+            field=gameapi.models.ResultField(
+                choices=[
+                    (gameapi.constants.Result["WIN"], gameapi.constants.Result["WIN"]),
+                    (
+                        gameapi.constants.Result["LOSE"],
+                        gameapi.constants.Result["LOSE"],
+                    ),
+                    (gameapi.constants.Result["TIE"], gameapi.constants.Result["TIE"]),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="multiplayergame",
+            name="player_1_choice",
+            field=models.SmallIntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="multiplayergame",
+            name="player_2_choice",
+            field=models.SmallIntegerField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomecounter",
+            name="player_1_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomecounter",
+            name="player_2_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomecounter",
+            name="result",
+            field=gameapi.models.ResultField(
+                choices=[
+                    (gameapi.constants.Result["WIN"], gameapi.constants.Result["WIN"]),
+                    (
+                        gameapi.constants.Result["LOSE"],
+                        gameapi.constants.Result["LOSE"],
+                    ),
+                    (gameapi.constants.Result["TIE"], gameapi.constants.Result["TIE"]),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomehourlyrollup",
+            name="player_1_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomehourlyrollup",
+            name="player_2_choice",
+            field=models.SmallIntegerField(
+                validators=[
+                    django.core.validators.MaxValueValidator(5),
+                    django.core.validators.MinValueValidator(1),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="outcomehourlyrollup",
+            name="result",
+            field=gameapi.models.ResultField(
+                choices=[
+                    (gameapi.constants.Result["WIN"], gameapi.constants.Result["WIN"]),
+                    (
+                        gameapi.constants.Result["LOSE"],
+                        gameapi.constants.Result["LOSE"],
+                    ),
+                    (gameapi.constants.Result["TIE"], gameapi.constants.Result["TIE"]),
+                ]
+            ),
+        ),
+    ]
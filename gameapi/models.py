@@ -1,10 +1,19 @@
 import uuid
 from dataclasses import dataclass
 
+from django.core import exceptions
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
-from gameapi.constants import GameChoices, choice_to_id, Result
+from gameapi.constants import (
+    GameChoices,
+    choice_to_id,
+    code_to_result,
+    Result,
+    result_to_code,
+    Seat,
+)
 
 
 @dataclass(frozen=True)
@@ -21,37 +30,216 @@ class Choice:
         return cls(choice_to_id[game_choice], game_choice.value)
 
 
+class ResultField(models.Field):
+    # A result stored as a small integer. Models, querysets and the API keep reading and writing the result value
+    def get_internal_type(self):
+        return "SmallIntegerField"
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            if isinstance(value, int):
+                return code_to_result[value].value
+            return Result(value).value
+        except (KeyError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        return result_to_code[Result(self.to_python(value))]
+
+
 class MultiplayerGame(models.Model):
-    player_1_uuid = models.UUIDField(default=uuid.uuid4, editable=False)
-    player_2_uuid = models.UUIDField(default=uuid.uuid4, editable=False)
+    player_1_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    player_2_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     waiting_another_player = models.BooleanField(default=True)
-    player_1_choice = models.IntegerField(
+    player_1_choice = models.SmallIntegerField(
         validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)],
         null=True,
         blank=True,
     )
-    player_2_choice = models.IntegerField(
+    player_2_choice = models.SmallIntegerField(
         validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)],
         null=True,
         blank=True,
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Incremented by every change of the game, clients use it to check if the game changed since their last request
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Only games with an open seat are indexed, so matchmaking lookups stay small no matter how many
+            # games were played
+            models.Index(
+                fields=["id"],
+                condition=models.Q(waiting_another_player=True),
+                name="multiplayergame_waiting_idx",
+            ),
+        ]
+
+
+@dataclass(frozen=True)
+class PlayerSeat:
+    game: MultiplayerGame
+    seat: Seat
+
+    @property
+    def player_uuid(self) -> uuid.UUID:
+        if self.seat == Seat.PLAYER_1:
+            return self.game.player_1_uuid
+        return self.game.player_2_uuid
 
 
 class Outcome(models.Model):
     game = models.ForeignKey(
-        MultiplayerGame, related_name="outcomes", on_delete=models.PROTECT, null=True
+        MultiplayerGame,
+        related_name="outcomes",
+        on_delete=models.PROTECT,
+        null=True,
+        # covered by the (game, id) index
+        db_index=False,
     )
-    result = models.CharField(
-        max_length=255,
+    result = ResultField(
         choices=[(value, value) for value in Result],
         null=False,
         blank=False,
     )
-    player_1_choice = models.IntegerField(
+    player_1_choice = models.SmallIntegerField(
         validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
     )
-    player_2_choice = models.IntegerField(
+    player_2_choice = models.SmallIntegerField(
         validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
     )
+    # Set when the outcome is created rather than when it is saved, outcomes written behind keep the time they were
+    # acknowledged at
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        # Outcomes were copied into this table when results and choices became small integers, see the migrations
+        # 0009 and 0010
+        db_table = "gameapi_outcome_compact"
+        indexes = [
+            # Game history is paginated by outcome id within a game
+            models.Index(fields=["game", "id"], name="outcome_compact_game_id_idx"),
+            # Rollups read outcomes by time
+            models.Index(fields=["created_at"], name="outcome_compact_created_idx"),
+        ]
+
+
+@dataclass(frozen=True)
+class GameHistory:
+    player_1_uuid: uuid.UUID
+    player_2_uuid: uuid.UUID
+    # model instances, or tuples of the requested fields
+    outcomes: list[Outcome] | list[tuple]
+    next_cursor: int | None
+
+
+class ScoreboardReset(models.Model):
+    # Outcomes up to this id were removed from the scoreboard
+    last_outcome_id = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class ScoreboardVersion(models.Model):
+    # Scoreboard version stamp in the shared database, for workers that don't share a version file. There is one row
+    version = models.BigIntegerField(default=0)
+
+
+class ArchivedOutcomeCount(models.Model):
+    # Number of pruned single player outcomes, per result and choices
+    result = ResultField(
+        choices=[(value, value) for value in Result],
+    )
+    player_1_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    player_2_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["result", "player_1_choice", "player_2_choice"],
+                name="archivedoutcomecount_unique_key",
+            ),
+        ]
+
+
+class OutcomeCounter(models.Model):
+    # Running number of outcomes per game mode, result and choices. Every key is split into shards that are picked at
+    # random on write, so concurrent writes of the same key rarely wait for each other
+    multiplayer = models.BooleanField()
+    shard = models.PositiveSmallIntegerField()
+    result = ResultField(
+        choices=[(value, value) for value in Result],
+    )
+    player_1_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    player_2_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # The game mode comes last, SQLite doesn't use an index for a bare boolean column in a WHERE clause
+            models.UniqueConstraint(
+                fields=[
+                    "result",
+                    "player_1_choice",
+                    "player_2_choice",
+                    "shard",
+                    "multiplayer",
+                ],
+                name="outcomecounter_unique_key",
+            ),
+        ]
+
+
+class OutcomeHourlyRollup(models.Model):
+    # Number of outcomes created within the hour starting at `bucket`, per game mode, result and choices
+    bucket = models.DateTimeField()
+    multiplayer = models.BooleanField()
+    result = ResultField(
+        choices=[(value, value) for value in Result],
+    )
+    player_1_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    player_2_choice = models.SmallIntegerField(
+        validators=[MaxValueValidator(len(choice_to_id)), MinValueValidator(1)]
+    )
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "bucket",
+                    "multiplayer",
+                    "result",
+                    "player_1_choice",
+                    "player_2_choice",
+                ],
+                name="outcomehourlyrollup_unique_key",
+            ),
+        ]
+
+
+class OutcomeRollupCheckpoint(models.Model):
+    # Time up to which outcomes were rolled up by the last run
+    processed_until = models.DateTimeField()
@@ -0,0 +1,134 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+
+import psycopg
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class LocalNotifier:
+    """Wakes up requests of this process that are waiting for a new outcome of a game."""
+
+    def __init__(self):
+        self._waiters: dict[int, dict[asyncio.Future, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, game_id: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(game_id, {})[future] = loop
+        return future
+
+    def unsubscribe(self, game_id: int, future: asyncio.Future) -> None:
+        with self._lock:
+            waiters = self._waiters.get(game_id, {})
+            waiters.pop(future, None)
+            if not waiters:
+                self._waiters.pop(game_id, None)
+
+    def notify(self, game_id: int) -> None:
+        # Can be called from any thread, futures are resolved on the loop they belong to
+        with self._lock:
+            waiters = self._waiters.pop(game_id, {})
+        for future, loop in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # the loop of a request that finished in the meantime was closed
+                pass
+
+    def notify_all(self) -> None:
+        with self._lock:
+            game_ids = list(self._waiters)
+        for game_id in game_ids:
+            self.notify(game_id)
+
+    def publish(self, game_id: int) -> None:
+        transaction.on_commit(lambda: self.notify(game_id))
+
+
+class PostgresNotifier(LocalNotifier):
+    """Delivers new outcomes to every worker process through Postgres LISTEN/NOTIFY.
+
+    Every process keeps one listening connection on a thread of its own and wakes up waiting requests whichever event
+    loop they run on.
+    """
+
+    channel = "gameapi_outcome"
+
+    def __init__(self):
+        super().__init__()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def subscribe(self, game_id: int) -> asyncio.Future:
+        self.start()
+        return super().subscribe(game_id)
+
+    def start(self) -> None:
+        # Threads don't survive a fork, every worker process starts its own listener
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._listen, name="outcome-listener", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self._thread = None
+        self._pid = None
+
+    def publish(self, game_id: int) -> None:
+        # NOTIFY is transactional, listeners receive it only once the outcome is committed
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, str(game_id)])
+
+    def _listen(self) -> None:
+        database = settings.DATABASES["default"]
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(
+                    dbname=database["NAME"],
+                    user=database["USER"],
+                    password=database["PASSWORD"],
+                    host=database["HOST"],
+                    port=database["PORT"],
+                    autocommit=True,
+                ) as listen_connection:
+                    listen_connection.execute(f"LISTEN {self.channel}")
+                    # Notifications sent while there was no listener are lost, waiting requests check again
+                    self.notify_all()
+                    while not self._stopping.is_set():
+                        for notification in listen_connection.notifies(timeout=1):
+                            self.notify(int(notification.payload))
+            except (psycopg.Error, OSError):
+                logger.exception("Listening for game outcomes failed, reconnecting")
+                time.sleep(1)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+NOTIFIERS = {
+    "local": LocalNotifier,
+    "postgres": PostgresNotifier,
+}
+
+notifier = NOTIFIERS[settings.GAME_NOTIFIER]()
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from gameapi.models import ArchivedOutcomeCount, Outcome, ScoreboardReset
+from gameapi.rollups import get_rollup_horizon
+
+
+def get_scoreboard_watermark() -> int:
+    return (
+        ScoreboardReset.objects.order_by("-id")
+        .values_list("last_outcome_id", flat=True)
+        .first()
+    ) or 0
+
+
+def _add_to_archive(key: dict, count: int) -> None:
+    updated = ArchivedOutcomeCount.objects.filter(**key).update(
+        count=F("count") + count
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ArchivedOutcomeCount.objects.create(**key, count=count)
+    except IntegrityError:
+        # created by a concurrent prune in the meantime
+        ArchivedOutcomeCount.objects.filter(**key).update(count=F("count") + count)
+
+
+def prune_outcomes(older_than: datetime, batch_size: int) -> int:
+    # Single player outcomes older than `older_than`, or removed from the scoreboard by a reset, are deleted in
+    # batches. Every batch is counted into ArchivedOutcomeCount in the same transaction it is deleted in
+    prunable = Q(game__isnull=True) & (
+        Q(created_at__lt=older_than) | Q(id__lte=get_scoreboard_watermark())
+    )
+    rollup_horizon = get_rollup_horizon()
+    if rollup_horizon is not None:
+        # Outcomes in buckets that the next rollup recomputes are still needed
+        prunable &= Q(created_at__lt=rollup_horizon)
+    pruned = 0
+    while True:
+        with transaction.atomic():
+            # Outcomes locked by a concurrent prune are left to it, so no outcome is counted twice
+            ids = list(
+                Outcome.objects.filter(prunable)
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            counts = (
+                Outcome.objects.filter(id__in=ids)
+                .values("result", "player_1_choice", "player_2_choice")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for row in counts:
+                count = row.pop("count")
+                _add_to_archive(row, count)
+            Outcome.objects.filter(id__in=ids).delete()
+        pruned += len(ids)
+    return pruned
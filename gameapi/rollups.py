@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from gameapi.models import Outcome, OutcomeHourlyRollup, OutcomeRollupCheckpoint
+from gameapi.stats import add_to_stats, empty_stats, finish_stats
+
+TIMESERIES_INTERVALS = {
+    "hour": TruncHour,
+    "day": TruncDay,
+}
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def get_rollup_horizon() -> datetime | None:
+    # Buckets before the horizon are never recomputed, so their outcomes aren't needed anymore
+    processed_until = (
+        OutcomeRollupCheckpoint.objects.values_list("processed_until", flat=True)
+        .filter(pk=1)
+        .first()
+    )
+    if processed_until is None:
+        return None
+    return floor_hour(processed_until - timedelta(hours=settings.ROLLUP_LATENESS_HOURS))
+
+
+def rollup_outcomes(now: datetime | None = None) -> int:
+    # Recomputes every bucket from the horizon on from the stored outcomes. Running it again gives the same rollups,
+    # and outcomes stored late, but within the lateness window, are counted by the next run
+    now = now or timezone.now()
+    with transaction.atomic():
+        checkpoint = (
+            OutcomeRollupCheckpoint.objects.select_for_update().filter(pk=1).first()
+        )
+        start = get_rollup_horizon() if checkpoint else None
+        if start is None:
+            earliest = Outcome.objects.aggregate(earliest=Min("created_at"))["earliest"]
+            start = floor_hour(earliest or now)
+
+        rows = (
+            Outcome.objects.filter(created_at__gte=start)
+            .annotate(
+                bucket=TruncHour("created_at"),
+                multiplayer=ExpressionWrapper(
+                    Q(game__isnull=False), output_field=BooleanField()
+                ),
+            )
+            .values(
+                "bucket", "multiplayer", "result", "player_1_choice", "player_2_choice"
+            )
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        rollups = [OutcomeHourlyRollup(**row) for row in rows]
+        OutcomeHourlyRollup.objects.filter(bucket__gte=start).delete()
+        OutcomeHourlyRollup.objects.bulk_create(rollups)
+        OutcomeRollupCheckpoint.objects.update_or_create(
+            pk=1, defaults={"processed_until": now}
+        )
+    return len(rollups)
+
+
+def get_timeseries(interval: str, start: datetime, end: datetime) -> list[dict]:
+    # Reads only rollup rows, buckets without outcomes are left out
+    rows = (
+        OutcomeHourlyRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+        .annotate(period=TIMESERIES_INTERVALS[interval]("bucket"))
+        .values("period", "multiplayer", "result", "player_1_choice", "player_2_choice")
+        .annotate(total=Sum("count"))
+        .order_by("period")
+    )
+    timeseries = {}
+    for row in rows:
+        add_to_stats(
+            timeseries.setdefault(row["period"], empty_stats()), row, row["total"]
+        )
+    return [
+        {"bucket": bucket, **finish_stats(stats)}
+        for bucket, stats in timeseries.items()
+    ]
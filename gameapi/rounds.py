@@ -0,0 +1,160 @@
+import uuid
+from dataclasses import dataclass
+from enum import Enum
+from functools import cache
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from gameapi.models import MultiplayerGame, Outcome
+from gameapi.rules import resolve
+from gameapi.stats import record_outcomes
+
+
+class RoundStatus(Enum):
+    NOT_FOUND = "not_found"
+    ALREADY_PLAYED = "already_played"
+    WAITING = "waiting"
+    COMPLETED = "completed"
+
+
+@dataclass(frozen=True)
+class RoundSubmission:
+    status: RoundStatus
+    outcome: Outcome | None = None
+
+
+@cache
+def _submit_move_sql(vendor: str) -> str:
+    # Stores the choice only for the seat that belongs to the player and only if that seat hasn't played yet, and bumps
+    # the game version. The returned choices tell if the move completed the round. `vendor` keys the cache, quoting
+    # differs per backend
+    quote_name = connection.ops.quote_name
+    fields = MultiplayerGame._meta
+
+    def column(name: str) -> str:
+        return quote_name(fields.get_field(name).column)
+
+    return (
+        "UPDATE {table} SET "
+        "{p1_choice} = CASE WHEN {p1_uuid} = %s THEN %s ELSE {p1_choice} END, "
+        "{p2_choice} = CASE WHEN {p2_uuid} = %s THEN %s ELSE {p2_choice} END, "
+        "{version} = {version} + 1 "
+        "WHERE ({p1_uuid} = %s AND {p1_choice} IS NULL) OR ({p2_uuid} = %s AND {p2_choice} IS NULL) "
+        "RETURNING {id}, {p1_choice}, {p2_choice}"
+    ).format(
+        table=quote_name(fields.db_table),
+        id=column("id"),
+        p1_uuid=column("player_1_uuid"),
+        p2_uuid=column("player_2_uuid"),
+        p1_choice=column("player_1_choice"),
+        p2_choice=column("player_2_choice"),
+        version=column("version"),
+    )
+
+
+@cache
+def _complete_round_sql(vendor: str) -> str:
+    # Resets the round and inserts its outcome in one statement. Only Postgres can update in a WITH clause, other
+    # backends run the two statements one after the other
+    quote_name = connection.ops.quote_name
+    games = MultiplayerGame._meta
+    outcomes = Outcome._meta
+
+    def column(fields, name: str) -> str:
+        return quote_name(fields.get_field(name).column)
+
+    return (
+        "WITH reset AS ("
+        "UPDATE {game_table} SET {p1_choice} = NULL, {p2_choice} = NULL WHERE {game_id} = %s RETURNING {game_id}"
+        ") "
+        "INSERT INTO {outcome_table} ({game}, {result}, {outcome_p1_choice}, {outcome_p2_choice}, {created_at}) "
+        "SELECT {game_id}, %s, %s, %s, %s FROM reset RETURNING {outcome_id}"
+    ).format(
+        game_table=quote_name(games.db_table),
+        game_id=column(games, "id"),
+        p1_choice=column(games, "player_1_choice"),
+        p2_choice=column(games, "player_2_choice"),
+        outcome_table=quote_name(outcomes.db_table),
+        outcome_id=column(outcomes, "id"),
+        game=column(outcomes, "game"),
+        result=column(outcomes, "result"),
+        outcome_p1_choice=column(outcomes, "player_1_choice"),
+        outcome_p2_choice=column(outcomes, "player_2_choice"),
+        created_at=column(outcomes, "created_at"),
+    )
+
+
+def _complete_round(
+    game_id: int, player_1_choice_id: int, player_2_choice_id: int
+) -> Outcome:
+    result = resolve(player_1_choice_id, player_2_choice_id).value
+    if connection.vendor != "postgresql":
+        # The row stays locked by the move until commit, so only this move can complete the round
+        MultiplayerGame.objects.filter(pk=game_id).update(
+            player_1_choice=None, player_2_choice=None
+        )
+        return Outcome.objects.create(
+            game_id=game_id,
+            player_1_choice=player_1_choice_id,
+            player_2_choice=player_2_choice_id,
+            result=result,
+        )
+
+    created_at = timezone.now()
+    fields = Outcome._meta
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _complete_round_sql(connection.vendor),
+            [
+                game_id,
+                fields.get_field("result").get_db_prep_save(result, connection),
+                player_1_choice_id,
+                player_2_choice_id,
+                fields.get_field("created_at").get_db_prep_save(created_at, connection),
+            ],
+        )
+        (outcome_id,) = cursor.fetchone()
+    return Outcome.from_db(
+        connection.alias,
+        ["id", "game_id", "result", "player_1_choice", "player_2_choice", "created_at"],
+        [
+            outcome_id,
+            game_id,
+            result,
+            player_1_choice_id,
+            player_2_choice_id,
+            created_at,
+        ],
+    )
+
+
+def submit_move(player_uuid: uuid.UUID, choice_id: int) -> RoundSubmission:
+    db_uuid = MultiplayerGame._meta.get_field("player_1_uuid").get_db_prep_value(
+        player_uuid, connection
+    )
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _submit_move_sql(connection.vendor),
+                [db_uuid, choice_id, db_uuid, choice_id, db_uuid, db_uuid],
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            # Nothing was updated, either the player is unknown or the player already has an answer for this round
+            game_exists = MultiplayerGame.objects.filter(
+                Q(player_1_uuid=player_uuid) | Q(player_2_uuid=player_uuid)
+            ).exists()
+            return RoundSubmission(
+                RoundStatus.ALREADY_PLAYED if game_exists else RoundStatus.NOT_FOUND
+            )
+
+        game_id, player_1_choice_id, player_2_choice_id = row
+        if player_1_choice_id is None or player_2_choice_id is None:
+            return RoundSubmission(RoundStatus.WAITING)
+
+        outcome = _complete_round(game_id, player_1_choice_id, player_2_choice_id)
+        record_outcomes([outcome])
+    return RoundSubmission(RoundStatus.COMPLETED, outcome)
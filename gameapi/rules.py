@@ -0,0 +1,37 @@
+from collections.abc import Iterable
+
+from gameapi.constants import Result, id_to_choice
+from gameapi.utils import did_player_1_win, get_result_from_bool
+
+# Row stride of the flattened outcome table. Choice ids start at 1, so index 0 of every row is left empty and a
+# round is resolved with a single lookup at `player_1_choice_id * _STRIDE + player_2_choice_id`
+_STRIDE = len(id_to_choice) + 1
+
+RESULT_TABLE: tuple[Result | None, ...] = tuple(
+    (
+        get_result_from_bool(
+            did_player_1_win(id_to_choice[player_1_id], id_to_choice[player_2_id])
+        )
+        if player_1_id in id_to_choice and player_2_id in id_to_choice
+        else None
+    )
+    for player_1_id in range(_STRIDE)
+    for player_2_id in range(_STRIDE)
+)
+
+
+def resolve(player_1_choice_id: int, player_2_choice_id: int) -> Result:
+    return RESULT_TABLE[player_1_choice_id * _STRIDE + player_2_choice_id]
+
+
+def resolve_many(
+    player_1_choice_ids: Iterable[int], player_2_choice_ids: Iterable[int]
+) -> list[Result]:
+    table = RESULT_TABLE
+    stride = _STRIDE
+    return [
+        table[player_1_id * stride + player_2_id]
+        for player_1_id, player_2_id in zip(
+            player_1_choice_ids, player_2_choice_ids, strict=True
+        )
+    ]
@@ -0,0 +1,163 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from gameapi.constants import SCOREBOARD_SIZE
+from gameapi.models import ScoreboardVersion
+
+ScoreboardEntry = tuple[int | None, dict[str, Any]]
+
+_STAMP_FORMAT = "<Q"
+_STAMP_SIZE = struct.calcsize(_STAMP_FORMAT)
+
+
+class VersionStamp:
+    """Counter shared by every worker process on the host through a memory mapped file."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._open_lock = threading.Lock()
+
+    def _mapping(self) -> mmap.mmap:
+        if self._map is None:
+            with self._open_lock:
+                if self._map is None:
+                    fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    try:
+                        if os.fstat(fd).st_size < _STAMP_SIZE:
+                            os.ftruncate(fd, _STAMP_SIZE)
+                    finally:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                    self._fd = fd
+                    self._map = mmap.mmap(fd, _STAMP_SIZE)
+        return self._map
+
+    def read(self) -> int:
+        return struct.unpack_from(_STAMP_FORMAT, self._mapping())[0]
+
+    def increment(self) -> int:
+        mapping = self._mapping()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            version = struct.unpack_from(_STAMP_FORMAT, mapping)[0] + 1
+            struct.pack_into(_STAMP_FORMAT, mapping, 0, version)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return version
+
+
+class DatabaseVersionStamp:
+    """Counter shared by every worker process on every host through a row in the database."""
+
+    def read(self) -> int:
+        return (
+            ScoreboardVersion.objects.filter(pk=1)
+            .values_list("version", flat=True)
+            .first()
+            or 0
+        )
+
+    def increment(self) -> int:
+        with transaction.atomic():
+            if not ScoreboardVersion.objects.filter(pk=1).update(
+                version=F("version") + 1
+            ):
+                try:
+                    with transaction.atomic():
+                        ScoreboardVersion.objects.create(pk=1, version=1)
+                except IntegrityError:
+                    # created by a concurrent write in the meantime
+                    ScoreboardVersion.objects.filter(pk=1).update(
+                        version=F("version") + 1
+                    )
+            return ScoreboardVersion.objects.values_list("version", flat=True).get(pk=1)
+
+
+VERSION_STORES = {
+    "file": lambda: VersionStamp(settings.SCOREBOARD_VERSION_FILE),
+    "database": DatabaseVersionStamp,
+}
+
+
+class ScoreboardCache:
+    """
+    Ring buffer with the latest serialized outcomes of this process.
+
+    Every write bumps the shared version stamp. When the stamp moved by exactly one, the write was the only change
+    since the buffer was last in sync and it is applied in place, otherwise the buffer is reloaded on the next read.
+    """
+
+    def __init__(self, stamp: VersionStamp | DatabaseVersionStamp, size: int):
+        self._stamp = stamp
+        self._entries: deque[ScoreboardEntry] = deque(maxlen=size)
+        self._version: int | None = None
+        self._lock = threading.Lock()
+
+    def get(self, load: Callable[[], list[ScoreboardEntry]]) -> list[dict[str, Any]]:
+        version = self._stamp.read()
+        with self._lock:
+            if version == self._version:
+                return [data for _, data in self._entries]
+        # Loading happens outside the lock, a write that lands in the meantime moves the stamp past `version`
+        # and the next read reloads again
+        entries = load()
+        with self._lock:
+            self._entries = deque(entries, maxlen=self._entries.maxlen)
+            self._version = version
+        return [data for _, data in entries]
+
+    def record(self, entries: Iterable[ScoreboardEntry]) -> None:
+        # `entries` are expected oldest first and already committed
+        version = self._stamp.increment()
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                self._version = None
+                return
+            known_ids = {outcome_id for outcome_id, _ in self._entries}
+            self._entries.extendleft(
+                entry
+                for entry in entries
+                if entry[0] is None or entry[0] not in known_ids
+            )
+            self._version = version
+
+    def push(self, entries: Iterable[ScoreboardEntry]) -> None:
+        # Applies entries that are acknowledged but not written yet to this process only, `publish` announces them
+        # to the other workers once they are committed
+        with self._lock:
+            if self._version is not None:
+                self._entries.extendleft(entries)
+
+    def publish(self) -> None:
+        version = self._stamp.increment()
+        with self._lock:
+            in_sync = self._version is not None and version == self._version + 1
+            self._version = version if in_sync else None
+
+    def clear(self) -> None:
+        version = self._stamp.increment()
+        with self._lock:
+            self._entries.clear()
+            in_sync = self._version is not None and version == self._version + 1
+            self._version = version if in_sync else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+
+scoreboard = ScoreboardCache(
+    VERSION_STORES[settings.SCOREBOARD_VERSION_STORE](), SCOREBOARD_SIZE
+)
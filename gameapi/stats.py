@@ -0,0 +1,174 @@
+import random
+from collections import Counter
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q, Sum
+
+from gameapi.constants import Result, id_to_choice
+from gameapi.models import ArchivedOutcomeCount, Outcome, OutcomeCounter
+from gameapi.rules import resolve
+
+
+def get_counter_keys() -> list[tuple[bool, str, int, int]]:
+    return [
+        (multiplayer, resolve(player_1_id, player_2_id).value, player_1_id, player_2_id)
+        for multiplayer in (False, True)
+        for player_1_id in id_to_choice
+        for player_2_id in id_to_choice
+    ]
+
+
+def seed_counters() -> None:
+    # Creating every counter row up front keeps the write path at a single UPDATE per key
+    OutcomeCounter.objects.bulk_create(
+        [
+            OutcomeCounter(
+                multiplayer=multiplayer,
+                shard=shard,
+                result=result,
+                player_1_choice=player_1_choice,
+                player_2_choice=player_2_choice,
+            )
+            for multiplayer, result, player_1_choice, player_2_choice in get_counter_keys()
+            for shard in range(settings.STATS_COUNTER_SHARDS)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _add_to_counter(key: dict, count: int) -> None:
+    updated = OutcomeCounter.objects.filter(**key).update(count=F("count") + count)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            OutcomeCounter.objects.create(**key, count=count)
+    except IntegrityError:
+        # created by a concurrent write in the meantime
+        OutcomeCounter.objects.filter(**key).update(count=F("count") + count)
+
+
+def record_outcomes(outcomes: Iterable[Outcome]) -> None:
+    # Has to be called in the transaction that writes the outcomes
+    counts = Counter(
+        (
+            outcome.game_id is not None,
+            outcome.result,
+            outcome.player_1_choice,
+            outcome.player_2_choice,
+        )
+        for outcome in outcomes
+    )
+    shard = random.randrange(settings.STATS_COUNTER_SHARDS)
+    for (multiplayer, result, player_1_choice, player_2_choice), count in sorted(
+        counts.items()
+    ):
+        _add_to_counter(
+            {
+                "multiplayer": multiplayer,
+                "shard": shard,
+                "result": result,
+                "player_1_choice": player_1_choice,
+                "player_2_choice": player_2_choice,
+            },
+            count,
+        )
+
+
+def rebuild_counters() -> None:
+    with transaction.atomic():
+        # Locking the counters first makes concurrent writes wait, outcomes they add are counted after the rebuild
+        list(OutcomeCounter.objects.select_for_update().values_list("id", flat=True))
+        OutcomeCounter.objects.update(count=0)
+        seed_counters()
+
+        totals = Counter()
+        outcome_counts = (
+            Outcome.objects.values("result", "player_1_choice", "player_2_choice")
+            .annotate(
+                multiplayer=ExpressionWrapper(
+                    Q(game__isnull=False), output_field=BooleanField()
+                ),
+                count=Count("id"),
+            )
+            .order_by()
+        )
+        for row in outcome_counts:
+            totals[
+                (
+                    row["multiplayer"],
+                    row["result"],
+                    row["player_1_choice"],
+                    row["player_2_choice"],
+                )
+            ] += row["count"]
+        for row in ArchivedOutcomeCount.objects.all():
+            totals[
+                (False, row.result, row.player_1_choice, row.player_2_choice)
+            ] += row.count
+
+        for (multiplayer, result, player_1_choice, player_2_choice), count in sorted(
+            totals.items()
+        ):
+            _add_to_counter(
+                {
+                    "multiplayer": multiplayer,
+                    "shard": 0,
+                    "result": result,
+                    "player_1_choice": player_1_choice,
+                    "player_2_choice": player_2_choice,
+                },
+                count,
+            )
+
+
+def empty_stats() -> dict:
+    return {"single_player": _empty_mode_stats(), "multiplayer": _empty_mode_stats()}
+
+
+def _empty_mode_stats() -> dict:
+    return {
+        "total": 0,
+        "results": {result.value: 0 for result in Result},
+        "player_choices": Counter(),
+        "opponent_choices": Counter(),
+    }
+
+
+def add_to_stats(stats: dict, row: dict, count: int) -> None:
+    mode_stats = stats["multiplayer" if row["multiplayer"] else "single_player"]
+    mode_stats["total"] += count
+    mode_stats["results"][row["result"]] += count
+    mode_stats["player_choices"][row["player_1_choice"]] += count
+    mode_stats["opponent_choices"][row["player_2_choice"]] += count
+
+
+def finish_stats(stats: dict) -> dict:
+    for mode_stats in stats.values():
+        for key in ["player_choices", "opponent_choices"]:
+            mode_stats[key] = [
+                {
+                    "id": choice_id,
+                    "name": choice.value,
+                    "count": mode_stats[key][choice_id],
+                }
+                for choice_id, choice in id_to_choice.items()
+            ]
+    return stats
+
+
+def get_stats() -> dict:
+    # Reads only the counter rows, their number doesn't depend on the number of outcomes
+    stats = empty_stats()
+    rows = (
+        OutcomeCounter.objects.values(
+            "multiplayer", "result", "player_1_choice", "player_2_choice"
+        )
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    for row in rows:
+        add_to_stats(stats, row, row["total"])
+    return finish_stats(stats)
@@ -1,13 +1,72 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
 import uuid
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
 
+import mock
 import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 
-from gameapi.constants import GameChoices, Result
-from gameapi.factories import MultiplayerGameFactory
+from gameapi.api.renderers import (
+    MessagePackParser,
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+)
+from gameapi.api.v1.serializers import (
+    CompiledSerializer,
+    GameSerializer,
+    OutcomeSerializer,
+    PlayOutputSerializer,
+)
+from gameapi.api.schema import generate_schema
+from gameapi.benchmarks.runner import compare_reports, plan_scenarios
+from gameapi.benchmarks.storage import measure_storage
+from gameapi.benchmarks.startup import (
+    ImportTime,
+    measure_first_request,
+    parse_import_times,
+    time_per_package,
+)
+from gameapi.constants import GameChoices, Result, Seat, choice_to_id, result_to_code
+from gameapi.factories import MultiplayerGameFactory, OutcomeFactory
+from gameapi.matchmaking import join_game
+from gameapi.metrics import MetricsRegistry, RequestTimings, get_pool_stats
+from gameapi.models import (
+    ArchivedOutcomeCount,
+    MultiplayerGame,
+    Outcome,
+    OutcomeCounter,
+    OutcomeHourlyRollup,
+    ScoreboardReset,
+)
+from gameapi.notifier import LocalNotifier, PostgresNotifier
+from gameapi.retention import prune_outcomes
+from gameapi.rollups import floor_hour, get_rollup_horizon, rollup_outcomes
+from gameapi.stats import get_stats, record_outcomes
+from gameapi.rounds import RoundStatus, submit_move
+from gameapi.rules import resolve, resolve_many
+from gameapi.scoreboard import DatabaseVersionStamp, ScoreboardCache, VersionStamp
+from gameapi.writebehind import OutcomeWriteBehind
 from gameapi.utils import (
     did_player_1_win,
     get_result_from_bool,
     find_game_by_player_uuid,
+    find_player_seat,
+    get_game_history,
 )
 
 
@@ -59,6 +118,32 @@ def test_get_result_from_bool(result, expected):
     assert get_result_from_bool(result) == expected
 
 
+@pytest.mark.parametrize("player_1_choice", list(GameChoices))
+@pytest.mark.parametrize("player_2_choice", list(GameChoices))
+def test_resolve(player_1_choice: GameChoices, player_2_choice: GameChoices):
+    expected = get_result_from_bool(did_player_1_win(player_1_choice, player_2_choice))
+    assert (
+        resolve(choice_to_id[player_1_choice], choice_to_id[player_2_choice])
+        == expected
+    )
+
+
+def test_resolve_many():
+    pairs = [
+        (player_1_id, player_2_id)
+        for player_1_id in choice_to_id.values()
+        for player_2_id in choice_to_id.values()
+    ]
+    player_1_ids, player_2_ids = zip(*pairs)
+
+    assert resolve_many(player_1_ids, player_2_ids) == [
+        resolve(player_1_id, player_2_id) for player_1_id, player_2_id in pairs
+    ]
+    assert resolve_many([], []) == []
+    with pytest.raises(ValueError):
+        resolve_many([1, 2], [1])
+
+
 @pytest.mark.django_db
 def test_find_game_by_player_uuid():
     game_1 = MultiplayerGameFactory(
@@ -87,3 +172,849 @@ def test_find_game_by_player_uuid():
     found_game = find_game_by_player_uuid(game_3.player_2_uuid)
     assert found_game is not None
     assert found_game.id == game_3.id
+
+
+@pytest.mark.django_db
+def test_find_player_seat():
+    game = MultiplayerGameFactory(
+        player_1_uuid=uuid.uuid4(), player_2_uuid=uuid.uuid4()
+    )
+    game.save()
+
+    assert find_player_seat(uuid.uuid4()) is None
+
+    player_seat = find_player_seat(game.player_1_uuid)
+    assert player_seat.game.id == game.id
+    assert player_seat.seat == Seat.PLAYER_1
+
+    player_seat = find_player_seat(game.player_2_uuid)
+    assert player_seat.game.id == game.id
+    assert player_seat.seat == Seat.PLAYER_2
+
+
+@pytest.mark.django_db
+def test_join_game():
+    player_seats = [join_game() for _ in range(10)]
+
+    assert len({player_seat.player_uuid for player_seat in player_seats}) == 10
+    assert [player_seat.seat for player_seat in player_seats] == [
+        Seat.PLAYER_1,
+        Seat.PLAYER_2,
+    ] * 5
+    assert MultiplayerGame.objects.count() == 5
+    assert not MultiplayerGame.objects.filter(waiting_another_player=True).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_join_game_concurrently():
+    if not connection.features.has_select_for_update_skip_locked:
+        pytest.skip("Database doesn't support SELECT ... FOR UPDATE SKIP LOCKED")
+
+    def claim_seat(_):
+        try:
+            return join_game()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        player_seats = list(executor.map(claim_seat, range(40)))
+
+    # no seat is ever handed out twice
+    assert len({player_seat.player_uuid for player_seat in player_seats}) == 40
+    first_seats = [
+        player_seat.game.id
+        for player_seat in player_seats
+        if player_seat.seat == Seat.PLAYER_1
+    ]
+    second_seats = [
+        player_seat.game.id
+        for player_seat in player_seats
+        if player_seat.seat == Seat.PLAYER_2
+    ]
+    assert len(first_seats) == len(set(first_seats))
+    assert len(second_seats) == len(set(second_seats))
+    assert set(second_seats) <= set(first_seats)
+    assert MultiplayerGame.objects.filter(waiting_another_player=False).count() == len(
+        second_seats
+    )
+
+
+@pytest.mark.django_db
+def test_submit_move():
+    game = MultiplayerGameFactory(
+        player_1_uuid=uuid.uuid4(), player_2_uuid=uuid.uuid4()
+    )
+    game.save()
+
+    assert submit_move(uuid.uuid4(), 1).status == RoundStatus.NOT_FOUND
+    assert submit_move(game.player_2_uuid, 3).status == RoundStatus.WAITING
+    assert submit_move(game.player_2_uuid, 1).status == RoundStatus.ALREADY_PLAYED
+
+    submission = submit_move(game.player_1_uuid, 1)
+    assert submission.status == RoundStatus.COMPLETED
+    assert submission.outcome.game_id == game.id
+    assert submission.outcome.player_1_choice == 1
+    assert submission.outcome.player_2_choice == 3
+    assert submission.outcome.result == Result.WIN.value
+
+    # the round is reset, so both players can play again
+    game.refresh_from_db()
+    assert game.player_1_choice is None
+    assert game.player_2_choice is None
+    assert submit_move(game.player_1_uuid, 2).status == RoundStatus.WAITING
+
+
+@pytest.mark.django_db(transaction=True)
+def test_submit_move_concurrently():
+    if connection.vendor != "postgresql":
+        pytest.skip("Concurrent moves need a database with row level locking")
+    game = MultiplayerGame.objects.create()
+    rounds = 20
+
+    def play(player_uuid):
+        try:
+            return [submit_move(player_uuid, 1).status for _ in range(rounds)]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        statuses = list(executor.map(play, [game.player_1_uuid, game.player_2_uuid]))
+
+    # every round is completed exactly once, no matter how the moves interleave
+    completed = sum(
+        player_statuses.count(RoundStatus.COMPLETED) for player_statuses in statuses
+    )
+    assert Outcome.objects.filter(game=game).count() == completed
+    game.refresh_from_db()
+    open_moves = int(game.player_1_choice is not None) + int(
+        game.player_2_choice is not None
+    )
+    accepted = sum(
+        player_statuses.count(RoundStatus.WAITING)
+        + player_statuses.count(RoundStatus.COMPLETED)
+        for player_statuses in statuses
+    )
+    assert accepted == 2 * completed + open_moves
+
+
+def test_version_stamp(tmp_path):
+    path = str(tmp_path / "scoreboard.version")
+    stamp_1 = VersionStamp(path)
+    stamp_2 = VersionStamp(path)
+
+    assert stamp_1.read() == 0
+    assert stamp_1.increment() == 1
+    assert stamp_2.increment() == 2
+    assert stamp_1.read() == stamp_2.read() == 2
+
+
+@pytest.mark.django_db
+def test_database_version_stamp():
+    # workers on different hosts share the stamp through the database
+    stamp_1 = DatabaseVersionStamp()
+    stamp_2 = DatabaseVersionStamp()
+
+    assert stamp_1.read() == 0
+    assert stamp_1.increment() == 1
+    assert stamp_2.increment() == 2
+    assert stamp_1.read() == stamp_2.read() == 2
+
+    worker_1 = ScoreboardCache(stamp_1, size=2)
+    worker_2 = ScoreboardCache(stamp_2, size=2)
+    load = mock.Mock(return_value=[(1, {"results": "win"})])
+    assert worker_1.get(load) == worker_2.get(load) == [{"results": "win"}]
+    worker_1.clear()
+    load.return_value = []
+    assert worker_2.get(load) == []
+    assert load.call_count == 3
+
+
+def test_scoreboard_cache(tmp_path):
+    path = str(tmp_path / "scoreboard.version")
+    database = [(1, {"results": "win"})]
+    # two caches sharing one stamp behave like two workers
+    worker_1 = ScoreboardCache(VersionStamp(path), size=2)
+    worker_2 = ScoreboardCache(VersionStamp(path), size=2)
+    load = mock.Mock(side_effect=lambda: list(database))
+
+    assert worker_1.get(load) == [{"results": "win"}]
+    assert worker_2.get(load) == [{"results": "win"}]
+    assert load.call_count == 2
+
+    # write on worker 1 is applied in place, worker 2 reloads
+    database.insert(0, (2, {"results": "tie"}))
+    worker_1.record([(2, {"results": "tie"})])
+    assert worker_1.get(load) == [{"results": "tie"}, {"results": "win"}]
+    assert load.call_count == 2
+    assert worker_2.get(load) == [{"results": "tie"}, {"results": "win"}]
+    assert load.call_count == 3
+
+    # ring buffer keeps only the latest entries and ignores already loaded ones
+    database.insert(0, (3, {"results": "lose"}))
+    worker_2.record([(2, {"results": "tie"}), (3, {"results": "lose"})])
+    assert worker_2.get(load) == [{"results": "lose"}, {"results": "tie"}]
+    assert load.call_count == 3
+
+    # clearing is visible to the other worker through the stamp
+    database.clear()
+    worker_1.clear()
+    assert worker_2.get(load) == []
+    assert worker_1.get(load) == []
+    assert load.call_count == 5
+
+
+def test_local_notifier():
+    local_notifier = LocalNotifier()
+
+    async def wait_for_outcome():
+        future = local_notifier.subscribe(1)
+        other_game_future = local_notifier.subscribe(2)
+        # outcomes are usually published from a sync worker thread
+        threading.Timer(0.01, local_notifier.notify, args=[1]).start()
+        await asyncio.wait_for(future, timeout=1)
+        assert not other_game_future.done()
+        local_notifier.unsubscribe(1, future)
+        local_notifier.unsubscribe(2, other_game_future)
+
+    asyncio.run(wait_for_outcome())
+    # notifying a game without waiters does nothing
+    local_notifier.notify(1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_postgres_notifier():
+    if connection.vendor != "postgresql":
+        pytest.skip("LISTEN/NOTIFY needs Postgres")
+    postgres_notifier = PostgresNotifier()
+
+    def publish():
+        try:
+            postgres_notifier.publish(1)
+        finally:
+            connection.close()
+
+    async def wait_for_outcome():
+        future = postgres_notifier.subscribe(1)
+        threading.Timer(0.2, publish).start()
+        try:
+            await asyncio.wait_for(future, timeout=5)
+        finally:
+            postgres_notifier.unsubscribe(1, future)
+
+    # every request runs on an event loop of its own in sync workers, they all share the listener of the process
+    try:
+        asyncio.run(wait_for_outcome())
+        listener = postgres_notifier._thread
+        asyncio.run(wait_for_outcome())
+        assert postgres_notifier._thread is listener
+        assert listener.is_alive()
+    finally:
+        postgres_notifier.stop()
+    assert not listener.is_alive()
+
+
+@pytest.mark.django_db
+def test_outcome_write_behind():
+    write_behind = OutcomeWriteBehind(
+        capacity=2, batch_size=10, interval=1, put_timeout=0, autostart=False
+    )
+    outcomes = [OutcomeFactory(game=None) for _ in range(3)]
+
+    write_behind.submit(outcomes[0])
+    write_behind.submit(outcomes[1])
+    assert write_behind.pending() == outcomes[:2]
+    assert not Outcome.objects.exists()
+
+    # the buffer is full, so the outcome is written by the caller
+    write_behind.submit(outcomes[2])
+    assert write_behind.pending() == outcomes[:2]
+    assert Outcome.objects.count() == 1
+
+    write_behind.flush()
+    assert write_behind.pending() == []
+    assert Outcome.objects.count() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_outcome_write_behind_drains_on_stop():
+    write_behind = OutcomeWriteBehind(
+        capacity=100, batch_size=5, interval=60, put_timeout=0
+    )
+    for _ in range(12):
+        write_behind.submit(OutcomeFactory(game=None))
+
+    write_behind.stop()
+    assert write_behind.pending() == []
+    assert Outcome.objects.count() == 12
+
+
+@pytest.mark.django_db(transaction=True)
+def test_outcome_write_behind_gives_up(caplog):
+    write_behind = OutcomeWriteBehind(
+        capacity=10,
+        batch_size=10,
+        interval=0.001,
+        put_timeout=0,
+        retries=2,
+        autostart=False,
+    )
+    write_behind.submit(OutcomeFactory(game=None))
+
+    with mock.patch.object(
+        Outcome.objects, "bulk_create", side_effect=DatabaseError("unavailable")
+    ) as bulk_create:
+        write_behind.flush()
+    assert bulk_create.call_count == 3
+    assert write_behind.pending() == []
+    assert not Outcome.objects.exists()
+    assert "Dropping 1 unwritten outcomes after 2 retries" in caplog.text
+
+
+def _archived_counts() -> Counter:
+    return Counter(
+        {
+            (row.result, row.player_1_choice, row.player_2_choice): row.count
+            for row in ArchivedOutcomeCount.objects.all()
+        }
+    )
+
+
+@pytest.mark.django_db
+def test_prune_outcomes():
+    game = MultiplayerGameFactory()
+    game.save()
+    old_outcomes = [OutcomeFactory(game=None) for _ in range(5)]
+    recent_outcomes = [OutcomeFactory(game=None) for _ in range(2)]
+    multiplayer_outcomes = [OutcomeFactory(game=game) for _ in range(2)]
+    for outcome in old_outcomes + recent_outcomes + multiplayer_outcomes:
+        outcome.save()
+    old = timezone.now() - timedelta(days=40)
+    Outcome.objects.filter(
+        id__in=[outcome.id for outcome in old_outcomes + multiplayer_outcomes]
+    ).update(created_at=old)
+
+    # old single player outcomes are deleted, but still counted
+    assert prune_outcomes(timezone.now() - timedelta(days=30), batch_size=2) == 5
+    assert set(Outcome.objects.values_list("id", flat=True)) == {
+        outcome.id for outcome in recent_outcomes + multiplayer_outcomes
+    }
+    assert _archived_counts() == Counter(
+        (outcome.result, outcome.player_1_choice, outcome.player_2_choice)
+        for outcome in old_outcomes
+    )
+
+    # outcomes removed from the scoreboard are pruned regardless of their age
+    ScoreboardReset.objects.create(last_outcome_id=recent_outcomes[-1].id)
+    output = StringIO()
+    call_command("prune_outcomes", days=30, stdout=output)
+    assert "Pruned 2 outcomes" in output.getvalue()
+    assert set(Outcome.objects.values_list("id", flat=True)) == {
+        outcome.id for outcome in multiplayer_outcomes
+    }
+    assert sum(_archived_counts().values()) == 7
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prune_outcomes_concurrently():
+    if connection.vendor != "postgresql":
+        pytest.skip("Concurrent prunes need a database with row level locking")
+    outcomes = [OutcomeFactory(game=None) for _ in range(200)]
+    Outcome.objects.bulk_create(outcomes)
+    barrier = threading.Barrier(4)
+
+    def prune(_):
+        try:
+            barrier.wait()
+            return prune_outcomes(timezone.now() + timedelta(days=1), batch_size=5)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pruned = sum(executor.map(prune, range(4)))
+
+    # every outcome is deleted and counted once, archive rows created by concurrent prunes don't fail
+    assert pruned == len(outcomes)
+    assert not Outcome.objects.exists()
+    assert _archived_counts() == Counter(
+        (outcome.result, outcome.player_1_choice, outcome.player_2_choice)
+        for outcome in outcomes
+    )
+
+
+@pytest.mark.django_db
+def test_rebuild_stats():
+    game = MultiplayerGameFactory()
+    game.save()
+    outcomes = [OutcomeFactory(game=None) for _ in range(4)] + [
+        OutcomeFactory(game=game) for _ in range(3)
+    ]
+    for outcome in outcomes:
+        outcome.save()
+    ArchivedOutcomeCount.objects.create(
+        result=Result.TIE.value, player_1_choice=1, player_2_choice=1, count=10
+    )
+    # counters that are out of date are replaced
+    record_outcomes(outcomes)
+
+    call_command("rebuild_stats", stdout=StringIO())
+    stats = get_stats()
+
+    assert stats["single_player"]["total"] == 14
+    assert stats["multiplayer"]["total"] == 3
+    expected_results = Counter(outcome.result for outcome in outcomes)
+    expected_results[Result.TIE.value] += 10
+    assert (
+        Counter(stats["single_player"]["results"])
+        + Counter(stats["multiplayer"]["results"])
+        == expected_results
+    )
+
+
+def _rollup_counts():
+    counts = Counter()
+    for row in OutcomeHourlyRollup.objects.all():
+        counts[(row.bucket, row.multiplayer)] += row.count
+    return counts
+
+
+def _create_outcome_at(created_at, game=None):
+    outcome = OutcomeFactory(
+        game=game, player_1_choice=1, player_2_choice=2, result=resolve(1, 2).value
+    )
+    outcome.save()
+    Outcome.objects.filter(id=outcome.id).update(created_at=created_at)
+
+
+@pytest.mark.django_db
+def test_rollup_outcomes(settings):
+    settings.ROLLUP_LATENESS_HOURS = 2
+    game = MultiplayerGameFactory()
+    game.save()
+    hour = floor_hour(timezone.now()) - timedelta(hours=10)
+    _create_outcome_at(hour + timedelta(minutes=10))
+    _create_outcome_at(hour + timedelta(minutes=50))
+    _create_outcome_at(hour + timedelta(hours=1, minutes=5), game=game)
+
+    assert rollup_outcomes(now=hour + timedelta(hours=2)) == 2
+    expected = {(hour, False): 2, (hour + timedelta(hours=1), True): 1}
+    assert _rollup_counts() == expected
+
+    # re-running gives the same rollups
+    rollup_outcomes(now=hour + timedelta(hours=2))
+    assert _rollup_counts() == expected
+
+    # outcomes stored late are counted while they are within the lateness window
+    _create_outcome_at(hour + timedelta(minutes=30))
+    _create_outcome_at(hour - timedelta(hours=1))
+    output = StringIO()
+    call_command("rollup_outcomes", stdout=output)
+    assert "Updated 2 hourly rollups" in output.getvalue()
+    expected[(hour, False)] += 1
+    assert _rollup_counts() == expected
+    assert get_rollup_horizon() == floor_hour(timezone.now()) - timedelta(hours=2)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"results": "win", "player": 1, "computer": 3},
+        [{"id": 1, "name": "rock"}, {"id": 2, "name": "paper"}],
+        {"player_uuid": uuid.UUID(int=1), "created_at": timezone.now()},
+        {"decimal": Decimal("1.50"), "text": "špock \u2028 \u2029", "none": None},
+    ],
+)
+def test_orjson_renderer_matches_drf(data):
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+    assert ORJSONRenderer().render(data, "application/json; indent=2") == (
+        JSONRenderer().render(data, "application/json; indent=2")
+    )
+
+
+def test_fast_parsers():
+    data = {"player": 1, "name": "špock"}
+    assert ORJSONParser().parse(BytesIO(ORJSONRenderer().render(data))) == data
+    assert (
+        MessagePackParser().parse(BytesIO(MessagePackRenderer().render(data))) == data
+    )
+    assert MessagePackRenderer().render(None) == b""
+
+    for parser, content in [(ORJSONParser(), b"{"), (MessagePackParser(), b"\xc1")]:
+        with pytest.raises(ParseError):
+            parser.parse(BytesIO(content))
+
+
+@pytest.mark.django_db
+def test_compiled_serializer_matches_play_output():
+    outcomes = [OutcomeFactory(game=None) for _ in range(5)]
+    for outcome in outcomes:
+        outcome.save()
+    compiled = CompiledSerializer(PlayOutputSerializer)
+    rows = Outcome.objects.order_by("id").values_list(*compiled.sources)
+
+    expected = JSONRenderer().render(PlayOutputSerializer(outcomes, many=True).data)
+    assert JSONRenderer().render(compiled.many(rows)) == expected
+    assert JSONRenderer().render([compiled.from_object(o) for o in outcomes]) == (
+        expected
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "outcome_count, params",
+    [
+        (0, {}),
+        (5, {"limit": 2}),
+        (5, {"limit": 10}),
+        (5, {"after": 2, "follow": True}),
+    ],
+)
+def test_compiled_serializer_matches_game(outcome_count, params):
+    game = MultiplayerGameFactory()
+    game.save()
+    for _ in range(outcome_count):
+        OutcomeFactory(game=game).save()
+    if "after" in params:
+        params["after"] = Outcome.objects.order_by("id")[params["after"]].id
+    compiled = CompiledSerializer(GameSerializer)
+
+    history = get_game_history(game, **params)
+    rows_history = get_game_history(
+        game, values=CompiledSerializer(OutcomeSerializer).sources, **params
+    )
+
+    assert rows_history.next_cursor == history.next_cursor
+    assert JSONRenderer().render(compiled.from_object(rows_history)) == (
+        JSONRenderer().render(GameSerializer(history).data)
+    )
+
+
+def test_metrics_registry_sums_worker_processes(tmp_path):
+    registry = MetricsRegistry(tmp_path)
+    timings = RequestTimings()
+    timings.queries = 3
+    timings.query_time = 0.002
+    registry.observe("play", 200, 0.004, timings)
+    registry.observe("unknown", 404, 0.3, RequestTimings())
+
+    # a forked worker writes to a file of its own
+    worker = multiprocessing.get_context("fork").Process(
+        target=registry.observe, args=("play", 500, 0.02, timings)
+    )
+    worker.start()
+    worker.join()
+    assert len(list(tmp_path.glob("metrics-*.bin"))) == 2
+
+    exported = registry.export()
+    for line in [
+        'gameapi_http_responses_total{route="play",status="2xx"} 1',
+        'gameapi_http_responses_total{route="play",status="5xx"} 1',
+        'gameapi_http_responses_total{route="other",status="4xx"} 1',
+        'gameapi_http_request_duration_seconds_bucket{route="play",le="0.005"} 1',
+        'gameapi_http_request_duration_seconds_bucket{route="play",le="0.025"} 2',
+        'gameapi_http_request_duration_seconds_bucket{route="play",le="+Inf"} 2',
+        'gameapi_http_request_duration_seconds_count{route="play"} 2',
+        'gameapi_db_queries_total{route="play"} 6',
+    ]:
+        assert line in exported.splitlines()
+    assert 'route="choices"' not in exported
+
+
+def test_metrics_registry_archives_stopped_workers(tmp_path):
+    registry = MetricsRegistry(tmp_path)
+
+    def serve(status_code):
+        registry.record_pool_stats({"pool_max": 8, "pool_size": 2, "requests_num": 3})
+        registry.observe("play", status_code, 0.004, RequestTimings())
+
+    for status_code in [200, 500]:
+        worker = multiprocessing.get_context("fork").Process(
+            target=serve, args=(status_code,)
+        )
+        worker.start()
+        worker.join()
+    # the second worker moved the values of the first one into the archive
+    assert len(list(tmp_path.glob("metrics-*.bin"))) == 2
+
+    # a file left by an earlier process with the same pid is archived, not continued
+    (tmp_path / f"metrics-{os.getpid()}.bin").write_bytes(
+        (tmp_path / "metrics-archive.bin").read_bytes()
+    )
+    registry.observe("play", 200, 0.004, RequestTimings())
+    registry.record_pool_stats({"pool_max": 8, "pool_size": 1})
+    assert {path.name for path in tmp_path.glob("metrics-*.bin")} == {
+        "metrics-archive.bin",
+        f"metrics-{os.getpid()}.bin",
+    }
+    exported = registry.export().splitlines()
+    for line in [
+        'gameapi_http_responses_total{route="play",status="2xx"} 3',
+        'gameapi_http_responses_total{route="play",status="5xx"} 1',
+        "gameapi_db_pool_requests_num_total 9",
+    ]:
+        assert line in exported
+    # gauges only count running workers
+    assert "gameapi_db_pool_size 1" in exported
+
+
+def test_metrics_registry_header_size(tmp_path):
+    registry = MetricsRegistry(tmp_path)
+    with mock.patch(
+        "gameapi.metrics.get_route_names", return_value=["route" * 100] * 10
+    ):
+        with pytest.raises(ValueError):
+            registry.observe("play", 200, 0.004, RequestTimings())
+
+
+@pytest.mark.django_db
+def test_benchmark_command(tmp_path):
+    assert plan_scenarios("mixed", 20, seed=1) == plan_scenarios("mixed", 20, seed=1)
+
+    baseline = tmp_path / "baseline.json"
+    output = StringIO()
+    with pytest.raises(CommandError):
+        call_command("benchmark", "--scenarios", "6", stdout=output)
+    assert not MultiplayerGame.objects.exists()
+
+    call_command(
+        "benchmark",
+        "--scenarios",
+        "6",
+        "--allow-writes",
+        "--output",
+        str(baseline),
+        stdout=output,
+    )
+    report = json.loads(baseline.read_text())
+    assert report["meta"]["target"] == "inprocess"
+    assert report["requests"] == sum(
+        route["requests"] for route in report["routes"].values()
+    )
+    for route in report["routes"].values():
+        assert route["latency_ms"]["p50"] <= route["latency_ms"]["p99"]
+        assert route["queries_per_request"] is not None
+    assert all(
+        status < "500"
+        for route in report["routes"].values()
+        for status in route["statuses"]
+    )
+
+    # a report compared to a copy of itself with half the throughput is a regression
+    slower = json.loads(baseline.read_text())
+    slower["throughput"] /= 2
+    lines = compare_reports(report, slower, tolerance=0.1)
+    assert lines[0].startswith("total throughput") and lines[0].endswith("REGRESSION")
+    assert not any("REGRESSION" in line for line in lines[1:])
+
+
+def test_committed_schema_is_up_to_date():
+    # Fails when views or serializers changed without running `python manage.py build_schema`
+    call_command("build_schema", "--check", stdout=StringIO())
+
+
+def test_build_schema(tmp_path, settings):
+    settings.OPENAPI_SCHEMA_FILE = tmp_path / "openapi.json"
+    with pytest.raises(CommandError):
+        call_command("build_schema", "--check", stdout=StringIO())
+    call_command("build_schema", stdout=StringIO())
+    assert json.loads(settings.OPENAPI_SCHEMA_FILE.read_text()) == generate_schema()
+    call_command("build_schema", "--check", stdout=StringIO())
+
+    settings.OPENAPI_SCHEMA_FILE.write_text("{}\n")
+    with pytest.raises(CommandError):
+        call_command("build_schema", "--check", stdout=StringIO())
+
+
+def test_parse_import_times():
+    imports = parse_import_times(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |     rest_framework.fields\n"
+        "import time:       300 |        400 |   rest_framework.serializers\n"
+        "import time:        50 |        450 | gameapi.api.v1.serializers\n"
+    )
+    assert imports[1] == ImportTime("rest_framework.serializers", 300, 400, 1)
+    assert time_per_package(imports) == {"rest_framework": 400, "gameapi": 50}
+
+
+def test_startup_report():
+    output = StringIO()
+    call_command("startup_report", "--runs", "1", "--top", "3", stdout=output)
+    assert output.getvalue().startswith("Time to first request")
+
+    result = measure_first_request()
+    assert result["status"] == "200 OK"
+    modules = {item.module for item in result["imports"]}
+    # views are imported with the app, the docs views only when the docs are opened
+    assert "gameapi.api.v1.views" in modules
+    assert "drf_spectacular.views" not in modules
+
+
+def test_metrics_registry_pool_stats(tmp_path):
+    registry = MetricsRegistry(tmp_path)
+    registry.observe("play", 200, 0.004, RequestTimings())
+    assert "gameapi_db_pool" not in registry.export()
+
+    registry.record_pool_stats({"pool_max": 8, "pool_size": 3, "requests_num": 2})
+    registry.record_pool_stats(
+        {"pool_max": 8, "pool_size": 2, "requests_num": 5, "requests_wait_ms": 1500}
+    )
+    # gauges of a worker that stopped aren't counted anymore, its counters are
+    worker = multiprocessing.get_context("fork").Process(
+        target=registry.record_pool_stats,
+        args=({"pool_max": 8, "pool_size": 4, "requests_num": 3},),
+    )
+    worker.start()
+    worker.join()
+
+    exported = registry.export().splitlines()
+    for line in [
+        "# TYPE gameapi_db_pool_size gauge",
+        "gameapi_db_pool_max 8",
+        "gameapi_db_pool_size 2",
+        "gameapi_db_pool_requests_num_total 8",
+        "gameapi_db_pool_requests_wait_seconds_total 1.5",
+        "gameapi_db_pool_connections_lost_total 0",
+    ]:
+        assert line in exported
+
+
+@pytest.mark.django_db
+def test_connection_pool():
+    if connection.vendor != "postgresql" or connection.pool is None:
+        pytest.skip("Database isn't a pooled Postgres connection")
+    Outcome.objects.count()
+    stats = get_pool_stats()
+    assert stats["pool_max"] == connection.settings_dict["OPTIONS"]["pool"]["max_size"]
+    assert stats["requests_num"] >= 1
+
+
+@pytest.mark.django_db
+def test_result_stored_as_small_integer():
+    outcome = Outcome.objects.create(
+        result=Result.LOSE.value, player_1_choice=1, player_2_choice=2
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT result FROM {Outcome._meta.db_table} WHERE id = %s", [outcome.id]
+        )
+        assert cursor.fetchone()[0] == result_to_code[Result.LOSE]
+
+    # models, querysets and lookups keep the result values
+    assert Outcome.objects.get(id=outcome.id).result == "lose"
+    assert list(Outcome.objects.values_list("result", flat=True)) == ["lose"]
+    assert Outcome.objects.filter(result=Result.LOSE).count() == 1
+    assert not Outcome.objects.filter(result__in=["win", "tie"]).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_outcomes():
+    executor = MigrationExecutor(connection)
+    executor.migrate([("gameapi", "0008_multiplayergame_version")])
+    apps = executor.loader.project_state(
+        ("gameapi", "0008_multiplayergame_version")
+    ).apps
+    old_outcome = apps.get_model("gameapi", "Outcome").objects.create(
+        result="win", player_1_choice=1, player_2_choice=3
+    )
+    try:
+        with pytest.raises(CommandError):
+            call_command("backfill_outcomes", stdout=StringIO())
+
+        executor.loader.build_graph()
+        executor.migrate([("gameapi", "0009_compactoutcome")])
+        apps = executor.loader.project_state(("gameapi", "0009_compactoutcome")).apps
+        LegacyOutcome = apps.get_model("gameapi", "Outcome")
+        CompactOutcome = apps.get_model("gameapi", "CompactOutcome")
+        if connection.vendor == "postgresql":
+            # both releases see what the other one writes
+            legacy = LegacyOutcome.objects.create(
+                result="tie", player_1_choice=2, player_2_choice=2
+            )
+            compact = CompactOutcome.objects.create(
+                result="lose", player_1_choice=4, player_2_choice=2
+            )
+            assert CompactOutcome.objects.get(id=legacy.id).result == "tie"
+            assert LegacyOutcome.objects.get(id=compact.id).result == "lose"
+            assert compact.id > legacy.id > old_outcome.id
+            LegacyOutcome.objects.filter(id=legacy.id).delete()
+            assert not CompactOutcome.objects.filter(id=legacy.id).exists()
+
+        output = StringIO()
+        call_command("backfill_outcomes", "--batch-size", "1", stdout=output)
+        assert "Copied 1 outcomes" in output.getvalue()
+        call_command("backfill_outcomes", stdout=output)
+        assert "Copied 0 outcomes" in output.getvalue()
+    finally:
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    outcome = Outcome.objects.get(id=old_outcome.id)
+    assert (outcome.result, outcome.player_1_choice, outcome.player_2_choice) == (
+        "win",
+        1,
+        3,
+    )
+    assert (
+        Outcome.objects.create(result="tie", player_1_choice=1, player_2_choice=1).id
+        > Outcome.objects.order_by("id").first().id
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_compact_counts_migration():
+    executor = MigrationExecutor(connection)
+    before = ("gameapi", "0012_outcomecounter_unique_key_order")
+    after = ("gameapi", "0013_compact_counts")
+    models = ["ArchivedOutcomeCount", "OutcomeCounter", "OutcomeHourlyRollup"]
+    keys = {
+        "ArchivedOutcomeCount": {},
+        "OutcomeCounter": {"multiplayer": True, "shard": 99},
+        "OutcomeHourlyRollup": {"multiplayer": False, "bucket": timezone.now()},
+    }
+
+    def stored_results(apps):
+        results = set()
+        with connection.cursor() as cursor:
+            for name in models:
+                model = apps.get_model("gameapi", name)
+                cursor.execute(
+                    f"SELECT result FROM {model._meta.db_table} WHERE count = 7"
+                )
+                results |= {row[0] for row in cursor.fetchall()}
+        return results
+
+    executor.migrate([before])
+    apps = executor.loader.project_state(before).apps
+    for name in models:
+        apps.get_model("gameapi", name).objects.create(
+            **keys[name], result="lose", player_1_choice=2, player_2_choice=3, count=7
+        )
+    try:
+        executor.loader.build_graph()
+        executor.migrate([after])
+        apps = executor.loader.project_state(after).apps
+        assert stored_results(apps) == {result_to_code[Result.LOSE]}
+        for name in models:
+            assert apps.get_model("gameapi", name).objects.get(count=7).result == "lose"
+
+        executor.loader.build_graph()
+        executor.migrate([before])
+        assert stored_results(executor.loader.project_state(before).apps) == {"lose"}
+    finally:
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    assert OutcomeCounter.objects.get(count=7, shard=99).result == "lose"
+    assert ArchivedOutcomeCount.objects.filter(result=Result.LOSE, count=7).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_storage_report():
+    if connection.vendor != "postgresql":
+        pytest.skip("The storage report needs Postgres")
+    sizes = measure_storage(games=10, outcomes=2000)
+    assert sizes["legacy"]["rows"] == sizes["compact"]["rows"] == 2000
+    assert sizes["compact"]["table"] < sizes["legacy"]["table"]
+
+    output = StringIO()
+    call_command("storage_report", "--games", "10", "--outcomes", "100", stdout=output)
+    assert "saved" in output.getvalue()
@@ -1,10 +1,11 @@
 import random
 import uuid
+from collections.abc import Sequence
 
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Q, Value, When
 
-from gameapi.constants import GameChoices, Result
-from gameapi.models import MultiplayerGame
+from gameapi.constants import GameChoices, Result, Seat, OUTCOME_PAGE_SIZE
+from gameapi.models import GameHistory, MultiplayerGame, Outcome, PlayerSeat
 
 win_transition = {
     GameChoices.PAPER: {GameChoices.ROCK, GameChoices.SPOCK},
@@ -36,7 +37,101 @@ def get_random_choice() -> GameChoices:
     return random.choice(list(win_transition.keys()))
 
 
-def find_game_by_player_uuid(player_uuid: uuid.UUID) -> MultiplayerGame | None:
+def _player_seat_query(player_uuid: uuid.UUID):
+    # Both uuid columns are unique, so this is resolved with two index probes regardless of the table size
     return MultiplayerGame.objects.filter(
         Q(player_1_uuid=player_uuid) | Q(player_2_uuid=player_uuid)
-    ).first()
+    ).annotate(
+        seat=Case(
+            When(player_1_uuid=player_uuid, then=Value(Seat.PLAYER_1.value)),
+            default=Value(Seat.PLAYER_2.value),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def _player_seat(game: MultiplayerGame | None) -> PlayerSeat | None:
+    if game is None:
+        return None
+    return PlayerSeat(game=game, seat=Seat(game.seat))
+
+
+def find_player_seat(player_uuid: uuid.UUID) -> PlayerSeat | None:
+    return _player_seat(_player_seat_query(player_uuid).first())
+
+
+async def afind_player_seat(player_uuid: uuid.UUID) -> PlayerSeat | None:
+    return _player_seat(await _player_seat_query(player_uuid).afirst())
+
+
+def find_game_by_player_uuid(player_uuid: uuid.UUID) -> MultiplayerGame | None:
+    player_seat = find_player_seat(player_uuid)
+    return player_seat.game if player_seat else None
+
+
+async def afind_game_by_player_uuid(player_uuid: uuid.UUID) -> MultiplayerGame | None:
+    player_seat = await afind_player_seat(player_uuid)
+    return player_seat.game if player_seat else None
+
+
+def _history_query(
+    game: MultiplayerGame, after: int, limit: int, values: Sequence[str] | None
+):
+    outcomes = Outcome.objects.filter(game_id=game.id, id__gt=after).order_by("id")
+    if values is None:
+        return outcomes[: limit + 1]
+    return outcomes.values_list("id", *values)[: limit + 1]
+
+
+def _build_history(
+    game: MultiplayerGame,
+    rows: list,
+    after: int,
+    limit: int,
+    follow: bool,
+    values: Sequence[str] | None,
+) -> GameHistory:
+    if values is None:
+        outcomes = rows
+        ids = [outcome.id for outcome in outcomes]
+    else:
+        ids = [row[0] for row in rows]
+        outcomes = [row[1:] for row in rows]
+    has_more = len(outcomes) > limit
+    outcomes = outcomes[:limit]
+    ids = ids[:limit]
+    if follow:
+        next_cursor = ids[-1] if ids else after
+    else:
+        next_cursor = ids[-1] if has_more else None
+    return GameHistory(
+        player_1_uuid=game.player_1_uuid,
+        player_2_uuid=game.player_2_uuid,
+        outcomes=outcomes,
+        next_cursor=next_cursor,
+    )
+
+
+def get_game_history(
+    game: MultiplayerGame,
+    after: int = 0,
+    limit: int = OUTCOME_PAGE_SIZE,
+    follow: bool = False,
+    values: Sequence[str] | None = None,
+) -> GameHistory:
+    # One page of outcomes newer than `after`. When paginating, `next_cursor` is empty once the history is exhausted.
+    # When following a game it always points to the newest outcome seen, so it can be used for the next request.
+    # With `values`, outcomes are returned as tuples of those fields instead of model instances
+    rows = list(_history_query(game, after, limit, values))
+    return _build_history(game, rows, after, limit, follow, values)
+
+
+async def aget_game_history(
+    game: MultiplayerGame,
+    after: int = 0,
+    limit: int = OUTCOME_PAGE_SIZE,
+    follow: bool = False,
+    values: Sequence[str] | None = None,
+) -> GameHistory:
+    rows = [row async for row in _history_query(game, after, limit, values)]
+    return _build_history(game, rows, after, limit, follow, values)
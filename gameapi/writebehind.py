@@ -0,0 +1,162 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from gameapi.models import Outcome
+from gameapi.scoreboard import scoreboard
+from gameapi.stats import record_outcomes
+
+logger = logging.getLogger(__name__)
+
+
+class OutcomeWriteBehind:
+    """
+    Bounded buffer of acknowledged outcomes that a background thread writes with `bulk_create`.
+
+    A batch is written every `interval` seconds or as soon as `batch_size` outcomes are waiting. When the buffer is
+    full, `submit` waits up to `put_timeout` seconds for space and then writes the outcome itself, so a slow database
+    slows down the callers instead of losing outcomes. A batch that can't be written is tried again up to `retries`
+    times, waiting twice as long before every try, and then dropped with an error.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        interval: float,
+        put_timeout: float,
+        retries: int = 10,
+        autostart: bool = True,
+    ):
+        self._capacity = capacity
+        self._batch_size = batch_size
+        self._interval = interval
+        self._put_timeout = put_timeout
+        self._retries = retries
+        self._autostart = autostart
+        self._buffer: deque[Outcome] = deque()
+        self._in_flight: list[Outcome] = []
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def submit(self, outcome: Outcome) -> None:
+        if self._autostart:
+            self.start()
+        with self._condition:
+            has_space = self._condition.wait_for(
+                lambda: len(self._buffer) < self._capacity, timeout=self._put_timeout
+            )
+            if has_space:
+                self._buffer.append(outcome)
+                self._condition.notify_all()
+                return
+        self._write([outcome], retry=False)
+
+    def pending(self) -> list[Outcome]:
+        # Outcomes that are acknowledged but possibly not committed yet, oldest first
+        with self._condition:
+            return self._in_flight + list(self._buffer)
+
+    def flush(self) -> None:
+        while batch := self._take_batch(timeout=0):
+            self._write(batch)
+
+    def start(self) -> None:
+        # Threads don't survive a fork, every worker process starts its own flusher
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="outcome-write-behind", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping.set()
+            self._condition.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self._thread = None
+        self._pid = None
+        # anything submitted after the flusher exited
+        self.flush()
+
+    def _run(self) -> None:
+        try:
+            while not self._stopping.is_set():
+                batch = self._take_batch(timeout=self._interval)
+                if batch:
+                    self._write(batch)
+            self.flush()
+        finally:
+            connection.close()
+
+    def _take_batch(self, timeout: float) -> list[Outcome]:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self._buffer) >= self._batch_size
+                or self._stopping.is_set(),
+                timeout=timeout,
+            )
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(self._batch_size, len(self._buffer)))
+            ]
+            self._in_flight.extend(batch)
+            # submitters waiting for space
+            self._condition.notify_all()
+        return batch
+
+    def _write(self, outcomes: list[Outcome], retry: bool = True) -> None:
+        attempt = 0
+        while True:
+            try:
+                with transaction.atomic():
+                    Outcome.objects.bulk_create(outcomes)
+                    record_outcomes(outcomes)
+                break
+            except Exception:
+                if not retry:
+                    raise
+                if self._stopping.is_set() or attempt >= self._retries:
+                    logger.exception(
+                        "Dropping %s unwritten outcomes after %s retries",
+                        len(outcomes),
+                        attempt,
+                    )
+                    break
+                logger.warning(
+                    "Writing %s outcomes failed, retrying",
+                    len(outcomes),
+                    exc_info=True,
+                )
+                connection.close()
+                time.sleep(self._interval * 2**attempt)
+                attempt += 1
+        with self._condition:
+            written = {id(outcome) for outcome in outcomes}
+            self._in_flight = [
+                outcome for outcome in self._in_flight if id(outcome) not in written
+            ]
+        scoreboard.publish()
+
+
+outcome_write_behind = OutcomeWriteBehind(
+    capacity=settings.OUTCOME_WRITE_BEHIND_CAPACITY,
+    batch_size=settings.OUTCOME_WRITE_BEHIND_BATCH_SIZE,
+    interval=settings.OUTCOME_WRITE_BEHIND_INTERVAL_MS / 1000,
+    put_timeout=settings.OUTCOME_WRITE_BEHIND_PUT_TIMEOUT_MS / 1000,
+    retries=settings.OUTCOME_WRITE_BEHIND_RETRIES,
+)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+bind = "0.0.0.0:8000"
+workers = int(os.environ.get("WEB_CONCURRENCY", 3))
+
+# The worker type follows SERVING_MODE, the same variable switches the views in the Django settings
+if os.environ.get("SERVING_MODE", "wsgi") == "asgi":
+    wsgi_app = "GameRPSSL.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "GameRPSSL.wsgi:application"
+
+# The master imports the app once and workers are forked from it, so they start serving right away and share the
+# memory of the loaded modules. Nothing connects to the database or starts a thread while the app is imported, every
+# worker opens its own connections and threads. Code changes then need a restart instead of a HUP
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+# The "local" notifier only wakes up requests waiting in the worker that stored the outcome, so gunicorn defaults to
+# "postgres", which reaches every worker
+os.environ.setdefault("GAME_NOTIFIER", "postgres")
+
+
+def on_starting(server):
+    # `--workers` on the command line overrides the value above, the server knows the final number
+    if server.cfg.workers > 1 and os.environ["GAME_NOTIFIER"] == "local":
+        sys.exit(
+            "GAME_NOTIFIER=local can't wake up requests waiting in another worker, use postgres or a single worker"
+        )